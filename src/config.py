@@ -14,6 +14,12 @@ WIKT_CACHE_FILE = os.path.join(WIKT_CACHE_DIR, 'cache.txt')
 WIKT_PATCH_FILE = os.path.join(WIKT_CACHE_DIR, 'patch.txt')
 WIKT_HTML_DIR = os.path.join(WIKT_CACHE_DIR, 'html')
 
+WIKT_API_URL = 'https://%s.wiktionary.org/w/api.php'
+WIKT_FETCH_WORKERS = 4      # concurrent fetching threads
+WIKT_RATE_LIMIT = 5.0       # max requests per second for each wiktionary host
+WIKT_BATCH_SIZE = 1         # kanji fetched by one batched request, at most 50 titles. 1 fetches page by page with action=parse
+PARSE_JOBS = 1              # processes parsing the kanji, 0 means one for each cpu
+
 
 ################################
 # output
@@ -1,6 +1,7 @@
 import os
 import sys
 import shutil
+import hashlib
 import docx
 
 def convert_to_writable(kanji_dict):
@@ -72,6 +73,38 @@ def prepare_file_path(input_path, is_dir=False, delete_if_exists=False, create_i
     return True
 
 
+def files_signature(paths):
+    """
+    A cheap signature of the files, the size and the modification time of each one. A missing file is
+    included as well, so creating or removing a file changes the signature.
+    """
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            signature.append((path, None, None))
+    return signature
+
+
+def files_digest(paths):
+    """
+    The SHA-256 hex digest of the names and the contents of the files, a missing file is hashed as missing.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.encode('utf-8') + b'\0')
+        if not os.path.isfile(path):
+            digest.update(b'missing\0')
+            continue
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
 def save_to_docx(sets, filename, header, filepath):
     # Import the Document class only once at the function start
     doc = docx.Document()
@@ -1,8 +1,8 @@
 from typing import Dict, List, Any, Tuple, Set, Union
-import copy
 from collections import defaultdict
+from wikt_parser.yomi_model import KanjiYomi, ReadingSymbols, compact_section
 
-def get_sorting_keys(kanji_info: Dict[str, Any], merge_hyogai: bool, reading_types_order: List[str]) -> tuple:
+def get_sorting_keys(kanji_info: KanjiYomi, merge_hyogai: bool, reading_types_order: List[str]) -> tuple:
     """
     Generate sorting keys for a kanji based on its reading information.
 
@@ -10,8 +10,11 @@ def get_sorting_keys(kanji_info: Dict[str, Any], merge_hyogai: bool, reading_typ
     that can be used as a key for sorting kanji. It considers different types of readings (呉音, 漢音, etc.)
     and can optionally include both 表内 (standard) and 表外 (non-standard) readings.
 
+    The readings in the key are the ids given by ReadingSymbols, which must have been built for kanji_info.
+    The example below shows the readings instead of their ids.
+
     Args:
-        kanji_info (Dict[str, Any]): A dictionary containing the kanji's reading information.
+        kanji_info (KanjiYomi): The kanji's reading information, the example below is its dict form.
         merge_hyogai (bool): If True, merge 表外 (hyōgai) readings. If False, only include 表内 readings.
 
     Returns:
@@ -44,22 +47,16 @@ def get_sorting_keys(kanji_info: Dict[str, Any], merge_hyogai: bool, reading_typ
     # Initialize a dictionary to store sets of readings for each reading type
     reading_sets = {key: set() for key in reading_types_order}
     
-    # Iterate through the kanji information
-    for reading_type, value in kanji_info.items():
-        # Skip reading types not in our predefined order
-        if reading_type not in reading_types_order:
+    # Iterate through the readings of each reading type and category (表内 or 表外)
+    for group in kanji_info.groups:
+        # Skip reading types not in our predefined order, and categories we're not interested in
+        if group.reading_type not in reading_sets or group.category not in categories:
             continue
-        
-        # Process each category (表内 or 表外) in the reading type
-        for category, items in value.items():
-            # Skip categories we're not interested in
-            if category not in categories:
-                continue
-            
-            # Add all pronunciations ('pron') to the set for this reading type
-            reading_sets[reading_type].update(item['pron'] for item in items if 'pron' in item)
 
-    # Create a tuple of sorted tuples for each reading type
+        # Add all pronunciations ('pron') to the set for this reading type
+        reading_sets[group.reading_type].update(reading.pron_id for reading in group.readings if reading.pron_id is not None)
+
+    # Create a tuple of sorted tuples for each reading type, the ids are sorted in the same order as the readings
     # This ensures a consistent order of readings for each type (呉音, 漢音, 慣用音, 宋唐音)
     sorted_readings = tuple(tuple(sorted(reading_sets[key])) for key in reading_types_order)
     
@@ -68,15 +65,16 @@ def get_sorting_keys(kanji_info: Dict[str, Any], merge_hyogai: bool, reading_typ
     return sorted_readings
 
 
-def sort_kanji(kanji_data: Dict[str, Any], merge_hyogai: bool = False) -> List[str]:
+def sort_kanji(kanji_data: Dict[str, KanjiYomi], merge_hyogai: bool = False) -> List[str]:
     """
     Sort kanji based on their reading information.
 
     This function sorts the kanji keys in the input dictionary based on their reading information,
     using the get_sorting_keys function to generate sorting keys for each kanji.
+    The ReadingSymbols of kanji_data is built first, so the ids of the readings are set.
 
     Args:
-        kanji_data (Dict[str, Any]): A dictionary where keys are kanji and values are their reading information.
+        kanji_data (Dict[str, KanjiYomi]): A dictionary where keys are kanji and values are their reading information.
         merge_hyogai (bool, optional): If True, merge 表外 (hyōgai) readings. Defaults to False.
 
     Returns:
@@ -86,11 +84,13 @@ def sort_kanji(kanji_data: Dict[str, Any], merge_hyogai: bool = False) -> List[s
         Output:
         ['亜', '唖', '娃', '阿', '哀', '愛', '挨', '姶', '逢', '葵']
     """
-    return sorted(kanji_data.keys(), key=lambda k: get_sorting_keys(kanji_data[k], merge_hyogai))
+    ReadingSymbols(kanji_data.values())
+    reading_types_order = OnyomiKeys.reading_types_order
+    return sorted(kanji_data.keys(), key=lambda k: get_sorting_keys(kanji_data[k], merge_hyogai, reading_types_order))
 
 
 def group_kanji_by_onyomi(
-        kanji_data: Dict[str, Any],
+        kanji_data: Dict[str, KanjiYomi],
         merge_hyogai: bool = False,
         group_by:str = 'all',
     ) -> Dict[Tuple[Tuple[str, ...], ...], List[str]]:
@@ -102,12 +102,13 @@ def group_kanji_by_onyomi(
     and 宋唐音 (sō-tō-on) readings in that order.
 
     Args:
-        kanji_data (Dict[str, Any]): A dictionary where keys are kanji and values are their reading information.
+        kanji_data (Dict[str, KanjiYomi]): A dictionary where keys are kanji and values are their reading information.
         merge_hyogai (bool, optional): If True, merge 表外 (hyōgai) readings. Defaults to False.
 
     Returns:
-        Dict[Tuple[Tuple[str, ...], ...], List[str]]: A dictionary where:
-            - Keys are tuples of tuples, each inner tuple containing strings of readings used for sorting (go-on, kan-on, kan'yō-on, sō-tō-on)
+        Dict[Tuple[Tuple[int, ...], ...], List[str]]: A dictionary where:
+            - Keys are tuples of tuples, each inner tuple containing ids of readings used for sorting (go-on, kan-on, kan'yō-on, sō-tō-on),
+              see ReadingSymbols. The example shows the readings instead of their ids.
             - Values are lists of kanji with similar readings based on the sorting key
 
     Example:
@@ -119,100 +120,191 @@ def group_kanji_by_onyomi(
             ...
         }
     """
-    def group_by_merge(go, kan, soto, kanyou):
-        merged_key = set([k for k in [go, kan, soto, kanyou] if k])
-        if len(merged_key) == 1:
-            group_key = (merged_key.pop(), (), (), (), ())
-            group_key_meta_list = ["呉音", "漢音", "慣用音", "宋唐音"]
-            onyomi_merge_flag = True
-        else:
-            group_key, group_key_meta_list = None, None
-            onyomi_merge_flag = False
-        return group_key, group_key_meta_list, onyomi_merge_flag
-
-    def group_by_go_kan(go, kan, soto, kanyou):
-        # Determine the grouping key based on available readings
-        # Priority: 呉音/漢音 > 慣用音 > 宋唐音
-        if go:
-            group_key = (go, kan, (), ())
-            group_key_meta_list = ['呉音', '漢音']
-        elif kan:
-            group_key = ((), kan, (), ())
-            group_key_meta_list = ['漢音']
-        elif soto:
-            group_key = ((), (), soto, ())
-            group_key_meta_list = ['慣用音']
-        elif kanyou:
-            group_key = ((), (), (), kanyou)
-            group_key_meta_list = ['宋唐音']
-        else:
-            group_key = ((), (), (), ())
-            group_key_meta_list = []
-        return group_key, group_key_meta_list, False
+    return OnyomiKeys(kanji_data, merge_hyogai).group(group_by)
+
 
-    def group_by_all(go, kan, soto, kanyou):
-        group_key = (go, kan, soto, kanyou)
+def _numpy():
+    # numpy is optional, the kanji are grouped in plain python without it
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def group_by_merge(go, kan, soto, kanyou):
+    merged_key = set([k for k in [go, kan, soto, kanyou] if k])
+    if len(merged_key) == 1:
+        group_key = (merged_key.pop(), (), (), (), ())
         group_key_meta_list = ["呉音", "漢音", "慣用音", "宋唐音"]
-        return group_key, group_key_meta_list, False
+        onyomi_merge_flag = True
+    else:
+        group_key, group_key_meta_list = None, None
+        onyomi_merge_flag = False
+    return group_key, group_key_meta_list, onyomi_merge_flag
+
+
+def group_by_go_kan(go, kan, soto, kanyou):
+    # Determine the grouping key based on available readings
+    # Priority: 呉音/漢音 > 慣用音 > 宋唐音
+    if go:
+        group_key = (go, kan, (), ())
+        group_key_meta_list = ['呉音', '漢音']
+    elif kan:
+        group_key = ((), kan, (), ())
+        group_key_meta_list = ['漢音']
+    elif soto:
+        group_key = ((), (), soto, ())
+        group_key_meta_list = ['慣用音']
+    elif kanyou:
+        group_key = ((), (), (), kanyou)
+        group_key_meta_list = ['宋唐音']
+    else:
+        group_key = ((), (), (), ())
+        group_key_meta_list = []
+    return group_key, group_key_meta_list, False
+
+
+def group_by_all(go, kan, soto, kanyou):
+    group_key = (go, kan, soto, kanyou)
+    group_key_meta_list = ["呉音", "漢音", "慣用音", "宋唐音"]
+    return group_key, group_key_meta_list, False
+
+
+def get_group_key(go, kan, soto, kanyou, group_by):
+    """
+    Returns:
+        tuple: (group_key, group_key_meta_list, onyomi_merge_flag) of a kanji by the group_by strategy.
+    """
+    if group_by == 'merge':
+        group_key, group_key_meta_list, onyomi_merge_flag = group_by_merge(go, kan, soto, kanyou)
+        if not group_key_meta_list:
+            group_key, group_key_meta_list, onyomi_merge_flag = group_by_go_kan(go, kan, soto, kanyou)
+    elif group_by == 'go_kan':
+        group_key, group_key_meta_list, onyomi_merge_flag = group_by_go_kan(go, kan, soto, kanyou)
+    else:
+        group_key, group_key_meta_list, onyomi_merge_flag = group_by_all(go, kan, soto, kanyou)
+    return group_key, group_key_meta_list, onyomi_merge_flag
+
+
+def get_group_sort_key(go, kan, soto, kanyou):
+    if go:
+        return (go, kan)
+    elif kan:
+        return (kan, ())
+    elif soto:
+        return (soto,())
+    elif kanyou:
+        return (kanyou, ())
+    return ((), ())
+
+
+class OnyomiKeys:
+    """
+    The sorting keys of the onyomi of each kanji, computed once and grouped by any group_by strategy, so
+    generating the tables of all the strategies only walks the readings once.
 
-    kanji_groups = defaultdict(list)
-    
+    Each distinct tuple of readings gets an id, the empty tuple is 0, and the kanji are kept as 4 columns
+    of tuple ids, one for each reading type (呉音, 漢音, 宋唐音, 慣用音). With numpy the columns are grouped
+    by np.lexsort, without it by a dict. Both give the same groups, in the same order, as inserting
+    the kanji into a dict one by one.
+    """
     reading_types_order = ['呉音', '漢音', '宋唐音', '慣用音']
 
-    for kanji, info in kanji_data.items():
-        if not info:
-            continue
-        
-        if info.get("has_hyonai_kunyomi", False):
-            kanji = f'{kanji}◦'
+    def __init__(self, kanji_data: Dict[str, KanjiYomi], merge_hyogai: bool = False):
+        self.kanji_list = []
+        # the reading tuples (go, kan, soto, kanyou) of each kanji
+        self.readings = []
+        self.tuple_ids = {(): 0}
+        self.columns = [[], [], [], []]
 
-        # Get sorting keys for the current kanji
-        go, kan, soto, kanyou = get_sorting_keys(info, merge_hyogai, reading_types_order)
-        
-        if group_by == 'merge':
-            group_key, group_key_meta_list, onyomi_merge_flag = group_by_merge(go, kan, soto, kanyou)
-            if not group_key_meta_list:
-                group_key, group_key_meta_list, onyomi_merge_flag = group_by_go_kan(go, kan, soto, kanyou)
-        elif group_by == 'go_kan':
-            group_key, group_key_meta_list, onyomi_merge_flag = group_by_go_kan(go, kan, soto, kanyou)
-        else:
-            group_key, group_key_meta_list, onyomi_merge_flag = group_by_all(go, kan, soto, kanyou)
-
-        if go:
-            sort_key = (go, kan)
-        elif kan:
-            sort_key = (kan, ())
-        elif soto:
-            sort_key = (soto,())
-        elif kanyou:
-            sort_key = (kanyou, ())
-        else:
-            sort_key = ((), ())
+        for kanji, info in kanji_data.items():
+            if not info:
+                continue
 
-        if group_key not in kanji_groups:
-            kanji_groups[group_key] = [sort_key, [kanji], group_key_meta_list, onyomi_merge_flag]
+            if info.has_hyonai_kunyomi:
+                kanji = f'{kanji}◦'
+
+            # Get sorting keys for the current kanji
+            readings = get_sorting_keys(info, merge_hyogai, self.reading_types_order)
+            self.kanji_list.append(kanji)
+            self.readings.append(readings)
+            for column, reading_tuple in zip(self.columns, readings):
+                column.append(self.tuple_ids.setdefault(reading_tuple, len(self.tuple_ids)))
+
+
+    def _group_indices(self, group_by):
+        """
+        Returns:
+            list: The indices of the kanji of each group, the groups in the order of their first kanji.
+        """
+        numpy = _numpy()
+        if numpy is None or not self.kanji_list:
+            groups = {}
+            for index, readings in enumerate(self.readings):
+                group_key = get_group_key(*readings, group_by)[0]
+                groups.setdefault(group_key, []).append(index)
+            return list(groups.values())
+
+        go, kan, soto, kanyou = [numpy.array(column, dtype=numpy.int64) for column in self.columns]
+        # the go_kan key keeps the first non empty one of go(with kan), kan, soto and kanyou
+        if group_by in ['go_kan', 'merge']:
+            case = numpy.select([go != 0, kan != 0, soto != 0, kanyou != 0], [0, 1, 2, 3], default=4)
+            keys = [numpy.where(case == 0, go, 0), numpy.where(case <= 1, kan, 0), numpy.where(case == 2, soto, 0), numpy.where(case == 3, kanyou, 0)]
         else:
-            kanji_groups[group_key][1].append(kanji)
-    
-    return kanji_groups
+            keys = [go, kan, soto, kanyou]
+        # the merge key is the only distinct non empty tuple, the first column tells the merge keys from the others
+        merged = numpy.zeros(len(go), dtype=numpy.int64)
+        if group_by == 'merge':
+            stacked = numpy.stack([go, kan, soto, kanyou])
+            non_empty = stacked != 0
+            highest = numpy.where(non_empty, stacked, 0).max(axis=0)
+            lowest = numpy.where(non_empty, stacked, numpy.iinfo(numpy.int64).max).min(axis=0)
+            merged = (highest == lowest).astype(numpy.int64)
+            keys = [numpy.where(merged == 1, highest, keys[0])] + [numpy.where(merged == 1, 0, key) for key in keys[1:]]
+
+        columns = numpy.stack([merged] + keys)
+        # lexsort takes the last row as the primary key, it's stable, so the kanji of a group keep their order
+        order = numpy.lexsort(columns[::-1])
+        sorted_columns = columns[:, order]
+        starts = numpy.flatnonzero(numpy.concatenate([[True], (sorted_columns[:, 1:] != sorted_columns[:, :-1]).any(axis=0)]))
+        ends = numpy.append(starts[1:], len(order))
+        # the first kanji of a group is the first one of its run, order the groups by it
+        group_order = numpy.argsort(order[starts], kind='stable')
+        return [order[starts[group]:ends[group]].tolist() for group in group_order]
+
+
+    def group(self, group_by: str = 'all') -> Dict[Tuple[Tuple[int, ...], ...], List[Any]]:
+        """
+        Group the kanji by the group_by strategy, merge, all or go_kan, see group_kanji_by_onyomi().
+        """
+        kanji_groups = defaultdict(list)
+        for indices in self._group_indices(group_by):
+            # the key, meta list and flag are the ones of the first kanji of the group
+            readings = self.readings[indices[0]]
+            group_key, group_key_meta_list, onyomi_merge_flag = get_group_key(*readings, group_by)
+            sort_key = get_group_sort_key(*readings)
+            kanji_groups[group_key] = [sort_key, [self.kanji_list[index] for index in indices], group_key_meta_list, onyomi_merge_flag]
+        return kanji_groups
         
 
 def group_kanji_by_kunyomi(
-        kanji_data: Dict[str, Any],
+        kanji_data: Dict[str, KanjiYomi],
         merge_hyogai: bool = False,
-    ) -> Dict[Tuple[str, ...], List[Any]]:
+    ) -> Dict[Tuple[int, ...], List[Any]]:
     """
     Sort and group kanji based on their kun'yomi (訓読み) reading information.
 
     This function groups kanji with similar kun'yomi readings together and sorts these groups.
 
     Args:
-        kanji_data (Dict[str, Any]): A dictionary where keys are kanji and values are their reading information.
+        kanji_data (Dict[str, KanjiYomi]): A dictionary where keys are kanji and values are their reading information.
         merge_hyogai (bool, optional): If True, merge 表外 (hyōgai) readings. Defaults to False.
 
     Returns:
-        Dict[Tuple[str, ...], List[Any]]: A dictionary where:
-            - Keys are tuples of strings, each string representing a kun'yomi reading used for sorting
+        Dict[Tuple[int, ...], List[Any]]: A dictionary where:
+            - Keys are tuples of ids, each id representing a kun'yomi reading used for sorting, see ReadingSymbols.
+              The example shows the readings instead of their ids.
             - Values are lists containing the sort key and a list of kanji with similar readings
 
     Example:
@@ -243,7 +335,7 @@ def group_kanji_by_kunyomi(
 
 def merge_kanji_info(
         kanji_list: List[str], 
-        info: Dict[str, Any], 
+        info: Dict[str, KanjiYomi], 
         group_key_meta_list: List[str],
         merge_hyogai: bool = False,
         show_hyogai_old: bool = False,
@@ -257,7 +349,7 @@ def merge_kanji_info(
 
     Args:
         kanji_list (List[str]): A list of kanji characters to process.
-        info (Dict[str, Any]): A dictionary containing detailed information for each kanji.
+        info (Dict[str, KanjiYomi]): A dictionary containing detailed information for each kanji.
         merge_hyogai (bool, optional): Whether to merge 表外 (hyōgai) readings. Defaults to False.
 
     Returns:
@@ -334,15 +426,12 @@ def merge_kanji_info(
     # merge the kanji together inside a group which has the same group_key.
     for kanji in kanji_list:
         kanji = kanji.replace('◦', '')
-        for reading_type, v in info[kanji].items():
-            if reading_type == "has_hyonai_kunyomi":
-                continue
-            for category, items in v.items():
-                for item in items:
-                    for pron, yomi in item.items():
-                        if pron == 'words_list':
-                            continue
-                        add_prons(category, pron, reading_type, yomi, kanji)
+        for group in info[kanji].groups:
+            for item in group.readings:
+                for pron, yomi in item.items():
+                    if pron == 'words_list':
+                        continue
+                    add_prons(group.category, pron, group.reading_type, yomi, kanji)
 
     # The follwoing section of code is to add kanji as a suffix for readings if: 
     # 1) it's not old reading
@@ -374,7 +463,7 @@ def merge_kanji_info(
 
 def merge_onyomi_groups(
         kanji_groups: Dict[str, Any],
-        info: Dict[str, Any],
+        info: Dict[str, KanjiYomi],
         merge_hyogai: bool = False,
         show_hyogai_old: bool = False,
     ) -> Dict[str, List[Union[str, Set[str], Dict[str, Any]]]]:
@@ -387,7 +476,7 @@ def merge_onyomi_groups(
     Args:
         kanji_groups (Dict[str, Any]): A dictionary of kanji groups, where each value is a tuple
                                        containing a sort key and a list of kanji.
-        info (Dict[str, Any]): A dictionary containing detailed information for each kanji.
+        info (Dict[str, KanjiYomi]): A dictionary containing detailed information for each kanji.
         include_hyogai (bool, optional): Whether to include 表外 (hyōgai) readings. Defaults to False.
 
     Returns:
@@ -440,7 +529,8 @@ def expand_and_sort_groups(groups: Dict[Tuple[Tuple[str, ...], ...], Any], dupli
 
     Returns:
         List[Dict[str, Any]]: A list of dictionaries, sorted by pronunciation and original index,
-        with each pronunciation having its own entry.
+        with each pronunciation having its own entry. The entries of a group are shallow copies of it,
+        the sets and lists in them are shared, so they should be read only.
     """
     # Create new groups, expanding each group for every pronunciation it has
     new_groups = []
@@ -459,11 +549,10 @@ def expand_and_sort_groups(groups: Dict[Tuple[Tuple[str, ...], ...], Any], dupli
             new_groups.append(merged_group)
             continue
         
-        # Create a new entry for each pronunciation in the group
+        # Create a new entry for each pronunciation in the group, the entries share the values of the group
         for pron in sorted(all_prons):
-            output_group = copy.deepcopy(merged_group)
             new_groups.append({
-                **output_group,
+                **merged_group,
                 "音序": pron,
                 "main_row_flag": False
             })
@@ -522,21 +611,52 @@ def generate_yomi_rows(
         - '宋唐音_old': {'タチツ'}
     """ 
     
-    # select only onyomi info
-    if onyomi_flag:
-        info = {key: value['ja']['音読み'] for key, value in kanji_yomi_dict.items()}
+    # the kunyomi rows take over the onyomi rows if both are asked
+    if not kunyomi_flag:
+        return generate_onyomi_rows(kanji_yomi_dict, [group_by], show_duplicated, merge_hyogai, show_hyogai_old)[group_by]
 
-        # Group kanji into groups
-        kanji_groups = group_kanji_by_onyomi(info, merge_hyogai, group_by)
+    info = {key: KanjiYomi(value['ja']['訓読み']) for key, value in kanji_yomi_dict.items() if value['ja']['訓読み']['訓読み']}
+    symbols = ReadingSymbols(info.values())
+    # Group kanji into groups
+    kanji_groups = group_kanji_by_kunyomi(info, merge_hyogai)
+    return rows_of_groups(kanji_groups, info, symbols, show_duplicated, merge_hyogai, show_hyogai_old)
+
+
+def generate_onyomi_rows(
+        kanji_yomi_dict: Dict[str, Any],
+        group_by_list: List[str],
+        show_duplicated: bool = False,
+        merge_hyogai: bool = False,
+        show_hyogai_old: bool = False,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    The onyomi rows of generate_yomi_rows() for each group_by of group_by_list. The readings are compacted
+    and the sorting keys are computed only once, then grouped by each group_by, see OnyomiKeys.
+
+    Returns:
+        Dict[str, List[Dict[str, Any]]]: {group_by: rows}
+    """
+    # select only onyomi info, as KanjiYomi which is walked faster than the nested dicts
+    info = compact_section(kanji_yomi_dict, '音読み')
+    symbols = ReadingSymbols(info.values())
+    onyomi_keys = OnyomiKeys(info, merge_hyogai)
 
-    if kunyomi_flag:
-        info = {}
-        info = {key: value['ja']['訓読み'] for key, value in kanji_yomi_dict.items() if value['ja']['訓読み']['訓読み']}
+    rows_dict = {}
+    for group_by in group_by_list:
         # Group kanji into groups
-        kanji_groups = group_kanji_by_kunyomi(info, merge_hyogai)
-    
+        kanji_groups = onyomi_keys.group(group_by)
+        rows_dict[group_by] = rows_of_groups(kanji_groups, info, symbols, show_duplicated, merge_hyogai, show_hyogai_old)
+    return rows_dict
+
+
+def rows_of_groups(kanji_groups, info, symbols, show_duplicated, merge_hyogai, show_hyogai_old):
     # Merge information for each group
     merged_groups = merge_onyomi_groups(kanji_groups, info, merge_hyogai, show_hyogai_old)
     
     # Expand and sort the groups based on pronunciations and original order
-    return expand_and_sort_groups(merged_groups, show_duplicated)
\ No newline at end of file
+    rows = expand_and_sort_groups(merged_groups, show_duplicated)
+
+    # the groups are sorted by the ids of the readings, convert them back for output
+    for row in rows:
+        row['sort_key'] = symbols.to_readings(row['sort_key'])
+    return rows
@@ -9,7 +9,7 @@ from output.ja_onyomi import generate_onyomi_file
 
 def output_ja_all(args):
     # get onyomi_dict
-    kanji_yomi_dict, kanji_ydkey_map, all_onyomi_keys = parse_ja_yomi(args.input_wiki_cache_dir)
+    kanji_yomi_dict, kanji_ydkey_map, all_onyomi_keys = parse_ja_yomi(args.input_wiki_cache_dir, use_cache=not args.no_cache, jobs=args.jobs)
     
     # output kunyomi and onyomi
     generate_kunyomi_file(args, kanji_yomi_dict)
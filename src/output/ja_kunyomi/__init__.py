@@ -33,5 +33,5 @@ def output_ja_kunyomi(args):
     """
     Deal with kunyomi of ja
     """
-    kanji_yomi_dict, kanji_ydkey_map, all_kunyomi_keys = parse_ja_yomi(args.input_wiki_cache_dir)
+    kanji_yomi_dict, kanji_ydkey_map, all_kunyomi_keys = parse_ja_yomi(args.input_wiki_cache_dir, use_cache=not args.no_cache, jobs=args.jobs)
     generate_kunyomi_file(args, kanji_yomi_dict)
\ No newline at end of file
@@ -38,6 +38,17 @@ def add_kunyomi_args(sub_parsers):
         action='store_true',
         help='show all duplicate entries by all pronunciations. By default, output only one entry for each group.'
     )
+    kunyomi_parser.add_argument(
+        '-nc', '--no_cache',
+        action='store_true',
+        help='Parse the wiktionary cache again instead of loading the cached parsed result. The cached result is refreshed as well. By default, the cached result is used unless any input changed.'
+    )
+    kunyomi_parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=config.PARSE_JOBS,
+        help=f'Number of processes parsing the wiktionary cache, 0 means one for each cpu. Only the kanji changed since the last parsing are parsed. (default: {config.PARSE_JOBS})'
+    )
 
     
 def regist_ja_kunyomi(sub_parsers):
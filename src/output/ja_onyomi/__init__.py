@@ -1,7 +1,7 @@
 import os
 import config
 from wikt_parser import parse_ja_yomi
-from output.formater import generate_yomi_rows
+from output.formater import generate_onyomi_rows
 from output.yomi_printer import output_yomi_info
 
 def generate_headers(duplicate_by_all, show_old_pron, show_hyogai):
@@ -20,21 +20,23 @@ def generate_headers(duplicate_by_all, show_old_pron, show_hyogai):
 
 
 def generate_onyomi_file(args, kanji_yomi_dict):
-    # merge onyomi groups
-    merged_onyomi_groups = generate_yomi_rows(kanji_yomi_dict, True, False, args.show_duplicated, args.merge_hyogai, args.show_hyogai_old, args.group_by)
+    # merge onyomi groups, of each group_by
+    group_by_list = list(dict.fromkeys(args.group_by))
+    onyomi_rows_dict = generate_onyomi_rows(kanji_yomi_dict, group_by_list, args.show_duplicated, args.merge_hyogai, args.show_hyogai_old)
     
     # Generate headers
     headers = generate_headers(args.show_duplicated, args.show_old_pron, args.show_hyogai)
 
     # output onyomi info
     appendix = 'md' if args.output_format == 'markdown' else 'csv'
-    output_path = os.path.join(args.output_dir, f'{config.ONYOMI_FILENAME}_{args.group_by}.{appendix}')
-    output_yomi_info(
-        merged_onyomi_groups, 
-        filename=output_path, 
-        output_format=args.output_format, 
-        headers=headers,
-    )
+    for group_by, merged_onyomi_groups in onyomi_rows_dict.items():
+        output_path = os.path.join(args.output_dir, f'{config.ONYOMI_FILENAME}_{group_by}.{appendix}')
+        output_yomi_info(
+            merged_onyomi_groups, 
+            filename=output_path, 
+            output_format=args.output_format, 
+            headers=headers,
+        )
 
 
 def output_ja_onyomi(args):
@@ -42,6 +44,6 @@ def output_ja_onyomi(args):
     Deal with onyomi of ja
     """
     # get onyomi_dict
-    kanji_yomi_dict, kanji_ydkey_map, all_onyomi_keys = parse_ja_yomi(args.input_wiki_cache_dir)
+    kanji_yomi_dict, kanji_ydkey_map, all_onyomi_keys = parse_ja_yomi(args.input_wiki_cache_dir, use_cache=not args.no_cache, jobs=args.jobs)
     # generate onyomi file
     generate_onyomi_file(args, kanji_yomi_dict)
@@ -32,9 +32,10 @@ def add_onyomi_args(sub_parsers):
     onyomi_parser.add_argument(
         '-by', '--group_by',
         type=str,
-        default='all',
+        nargs='+',
+        default=['all'],
         choices=['merge', 'all', 'go_kan'],
-        help='Group by.'
+        help='Group by. Multiple values can be given, e.g. -by all merge, a file is generated for each of them.'
     )
     onyomi_parser.add_argument(
         '-y', '--merge_hyogai',
@@ -61,6 +62,17 @@ def add_onyomi_args(sub_parsers):
         action='store_true',
         help='show all duplicate entries by all pronunciations. By default, output only one entry for each group.'
     )
+    onyomi_parser.add_argument(
+        '-nc', '--no_cache',
+        action='store_true',
+        help='Parse the wiktionary cache again instead of loading the cached parsed result. The cached result is refreshed as well. By default, the cached result is used unless any input changed.'
+    )
+    onyomi_parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=config.PARSE_JOBS,
+        help=f'Number of processes parsing the wiktionary cache, 0 means one for each cpu. Only the kanji changed since the last parsing are parsed. (default: {config.PARSE_JOBS})'
+    )
 
 def output_ja_onyomi_wrapper(args):
     if args.output_format == 'csv' and args.output_dir == config.MARKDOWN_PATH:
@@ -44,6 +44,17 @@ def add_wordslist_args(sub_parsers):
         default=config.HTML_PATH,
         help=f'Dir to the wiktionary output file. If not specified, defaults to {config.HTML_PATH}.'
     )
+    wordslist_parser.add_argument(
+        '-nc', '--no_cache',
+        action='store_true',
+        help='Parse the wiktionary cache again instead of loading the cached parsed result. The cached result is refreshed as well. By default, the cached result is used unless any input changed.'
+    )
+    wordslist_parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=config.PARSE_JOBS,
+        help=f'Number of processes parsing the wiktionary cache, 0 means one for each cpu. Only the kanji changed since the last parsing are parsed. (default: {config.PARSE_JOBS})'
+    )
 
     
 def genereate_kanji_detail(args):
@@ -55,7 +66,7 @@ def genereate_kanji_detail(args):
     # generate wordslist
     if args.wordslist:
         # get kunyomi_dict
-        kanji_yomi_dict, kanji_ydkey_map, all_kunyomi_keys = parse_ja_yomi(args.input_wiki_cache_dir)
+        kanji_yomi_dict, kanji_ydkey_map, all_kunyomi_keys = parse_ja_yomi(args.input_wiki_cache_dir, use_cache=not args.no_cache, jobs=args.jobs)
 
         # output wordslist
         output_wordslist(wordslist_path, kanji_yomi_dict, kanji_ydkey_map)
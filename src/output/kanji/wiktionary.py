@@ -1,6 +1,7 @@
 import os
 import re
 import json
+import gzip
 from file_util import prepare_file_path
 def update_html_text(raw_text, language):
     # Remove HTML comments (including multi-line comments)
@@ -26,7 +27,8 @@ def update_html_text(raw_text, language):
 
 
 def update_html_file(src_path, dst_path):
-    with open(src_path, 'r', encoding='utf-8') as src_file:
+    # the html files are saved as gzipped .json.gz files when they are fetched with compression
+    with (gzip.open(src_path, 'rt', encoding='utf-8') if src_path.endswith('.gz') else open(src_path, 'r', encoding='utf-8')) as src_file:
         html_dict = json.load(src_file)
     
     html_text = ''
@@ -50,7 +52,10 @@ def convert_wikt_to_html(src_dir, dst_dir):
     prepare_file_path(dst_dir, is_dir=True, create_if_not_exists=True, delete_if_exists=True)
 
     for filename in sorted(os.listdir(src_dir)):
-        file_base_name = os.path.splitext(filename)[0]
+        # left by an interrupted fetching
+        if filename.endswith('.tmp'):
+            continue
+        file_base_name = filename.split('.')[0]
         src_file_path = os.path.join(src_dir, filename)
         dst_file_path = os.path.join(dst_dir, f'{file_base_name}.html')
         update_html_file(src_file_path, dst_file_path)
\ No newline at end of file
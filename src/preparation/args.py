@@ -1,6 +1,7 @@
 import argparse
 import os
 from preparation import prepare_kanji_data
+from preparation.snapshot import PreparationSnapshot
 
 def boolean_arg(value):
     if value.lower() in ('yes', 'true', 't', 'y', '1'):
@@ -55,8 +56,22 @@ def add_prepare_kanji_args(sub_parsers):
         default='../data/preparation',
         help='Source data directory (default: ../data/preparation)'
     )
+    prepare_parser.add_argument(
+        '-bi', '--build_index',
+        action='store_true',
+        help='Build the snapshot of the parsed source data only, which is loaded instead of parsing the source files. It is rebuilt automatically when the source files change.'
+    )
 
 def preparation_wrapper(args):
+    if args.build_index:
+        snapshot = PreparationSnapshot(args.source_data_dir)
+        sources = snapshot.build()
+        if snapshot.load() is None:
+            print(f'{snapshot.snapshot_path} can not be saved.')
+            return
+        print(f'{snapshot.snapshot_path} is built, {sum(len(source) for source in sources.values())} entries of {len(sources)} sources.')
+        return
+
     # Check if the output file extension matches the specified format
     _, file_extension = os.path.splitext(args.output_file_path)
     if file_extension[1:].lower() != args.format.lower():
@@ -1,21 +1,25 @@
-import os
+import itertools
 from preparation.utils import readfile
 from util_kana import check_katakana_hirakana
 from typing import Dict, Any
 
-def deal_joyokanji(source, appendix):
-    # Initialize an empty dictionary to store the kanji characters and their readings
-    kanji_set = {}
+def iter_joyokanji(source, appendix):
+    """
+    Parse the lines of the jouyou kanji table, yielding (kanji, readings) for each kanji block as soon as
+    its last line is read, e.g. ('亜/亞', {'ア': '亜流 亜麻 亜熱帯'}).
+
+    Args:
+        source: An iterable of the lines, e.g. the generator returned by readfile().
+        appendix: A string to append to each kanji character.
+    """
     previous = '*'  # Initialize the previous character as '*'
     
     ji = []  # List to store kanji characters
     ji_flag = True  # Flag to indicate if we are processing kanji characters
     yomi = {}  # Dictionary to store readings for the kanji characters
 
-    # Append a '*' to the source to mark the end of the data
-    source.append('*')
-    
-    for current in source:
+    # A '*' after the source marks the end of the last block
+    for current in itertools.chain(source, ['*']):
         # Skip empty strings and consecutive '*' characters
         if current == '' or (current == '*' and previous == '*'):
             continue
@@ -23,7 +27,7 @@ def deal_joyokanji(source, appendix):
         # If the current string is '*', it indicates the end of a kanji block
         if current == '*':
             previous = current  # Update the previous character
-            kanji_set['/'.join(ji)] = yomi  # Add the kanji and readings to the dictionary
+            yield '/'.join(ji), yomi  # Yield the kanji and readings of the block
             ji = []  # Reset the kanji list
             ji_flag = True  # Reset the flag
             yomi = {}  # Reset the readings dictionary
@@ -55,7 +59,10 @@ def deal_joyokanji(source, appendix):
 
         previous = current  # Update the previous character
 
-    return kanji_set  # Return the resulting dictionary
+
+def deal_joyokanji(source, appendix):
+    # the kanji characters and their readings of all the blocks
+    return dict(iter_joyokanji(source, appendix))
 
 
 def load_jouyou(data_root_dir, appendix = ''):
@@ -1,7 +1,5 @@
-from preparation.jouyou import load_jouyou
-from preparation.jinmei import load_jinmei
-from preparation.hyougai import load_hyougai
-from preparation.itai import load_itai
+from preparation.snapshot import load_sources
+from preparation.variant_index import VariantIndex
 
 
 def load_local_kanji(jouyou=True, jinmei=True, hyougai=True, itai=True, with_tag=True, data_root_dir='../data/preparation/'):
@@ -29,14 +27,17 @@ def load_local_kanji(jouyou=True, jinmei=True, hyougai=True, itai=True, with_tag
     """
     kanji_dict = {}
 
-    # An assistant dictionary
-    # Any kanji appearred as the key, the key in kanji_dict as the value of them.
-    temp_dict= {}
+    sources = load_sources(data_root_dir)
+    jouyou = sources['jouyou'] if jouyou else {}
+    hyougai = sources['hyougai'] if hyougai else {}
+    jinmei = sources['jinmei'] if jinmei else {}
+    itai = sources['itai'] if itai else {}
 
-    jouyou = load_jouyou(data_root_dir) if jouyou else {}
-    hyougai = load_hyougai(data_root_dir) if hyougai else {}
-    jinmei = load_jinmei(data_root_dir) if jinmei else {}
-    itai = load_itai(data_root_dir) if itai else {}
+    # the itai groups of all the sources, so the key of each group is known before merging the data
+    variant_index = build_variant_index([jouyou, hyougai, jinmei, itai], key=lambda kanji: kanji)
+
+    # the kanji which have been put in the value list of kanji_dict
+    added_kanji = set()
 
     # merge these 4 kinds of source data
     for index, source in enumerate([jouyou, hyougai, jinmei, itai], start=1):
@@ -46,37 +47,21 @@ def load_local_kanji(jouyou=True, jinmei=True, hyougai=True, itai=True, with_tag
             if ji.strip().strip('/') == '':
                 continue
 
-            items = sorted(ji.split('/'))
-            matched = [item for item in items if item in temp_dict]
-            mismatched = list(set(items) - set(matched))
-            
-            # when matched list is empty, append all element in items list to kanji_dict with key items[0]
-            if not matched:
-                kanji_dict[items[0]] = {
-                        'kanji': [appendix + item for item in items],
-                        'kana': kana}
-                temp_dict.update({item: items[0] for item in items})
-                continue
-            
-            # following code block dealing with the condition when matched list is not emppty
-            repesentative = temp_dict[matched[0]]
-
-            # when items[0] is equal or bigger than the original key in kanji_dict, 
-            # we still let the orignal key as the key
-            if items[0] == repesentative or sorted([items[0], repesentative])[0] == repesentative:
-                kanji_dict[repesentative]['kanji'] += [appendix + item for item in mismatched]
-                kanji_dict[repesentative]['kana'].update(kana)
-                temp_dict.update({item: repesentative for item in mismatched})
+            items = sorted(item.strip() for item in ji.split('/') if item.strip())
+            mismatched = [item for item in items if item not in added_kanji]
+            added_kanji.update(mismatched)
+            repesentative = variant_index.find(items[0])
+
+            # the first entry of the group, append all element in items list to kanji_dict
+            if repesentative not in kanji_dict:
+                # the sources are shared by the loaders, don't update their dicts
+                kanji_dict[repesentative] = {
+                        'kanji': [appendix + item for item in mismatched],
+                        'kana': dict(kana)}
                 continue
-            
-            # when items[0] is smaller than the orignal key, 
-            # we replace the original key to items[0] 
-            items2 = sorted(mismatched + [item[1] for item in kanji_dict[repesentative]['kanji']])
+
             kanji_dict[repesentative]['kanji'] += [appendix + item for item in mismatched]
             kanji_dict[repesentative]['kana'].update(kana)
-            kanji_dict[items2[0]] = kanji_dict[repesentative]
-            del kanji_dict[repesentative]
-            temp_dict.update({item: items[0] for item in items2})
 
     kanji_list = []
     for key in sorted(kanji_dict):
@@ -95,37 +80,28 @@ def load_local_kanji_without_tag(data_root_dir):
         ...
     }
     """
-    # Initialize a dictionary to store kanji groupings
-    kanji_dict = {}
-
     # Load various sets of kanji characters from different categories
-    jouyou = load_jouyou(data_root_dir)
-    hyougai = load_hyougai(data_root_dir)
-    jinmei = load_jinmei(data_root_dir)
-    itai = load_itai(data_root_dir)
-    
-    # Combine keys from all dictionaries and iterate through them
-    for kanji_str in list(jouyou.keys()) + list(jinmei.keys()) + list(hyougai.keys()) + list(itai.keys()):
-        # Split each key on '/' to handle kanji groups, and then sort them
-        kanji_group = sorted(kanji_str.split('/'))
-        
-        # Skip processing if no kanji exist
-        if len(kanji_group) < 1:
-            continue
-        
-        # Check if any kanji already exists in the kanji_dict to avoid duplicate entries
-        # merge kanji_group to already exists entry in kanji_dict
-        for kanji in kanji_group:
-            if kanji in kanji_dict:
-                break
-
-        # Set the first kanji (smallest after sorting) as the key in kanji_dict
-        # Combines its current value with the new kanji_group set, ensuring no duplications
-        kanji_dict[kanji_group[0]] = set.union(kanji_dict.get(kanji, set()), set(kanji_group))
-        
-        # Clean out duplicate entries and ensure only representative kanji remains as the key
-        if kanji_group.index(kanji) != 0 and kanji in kanji_dict:
-            del kanji_dict[kanji]
-
-    # Return the dictionary of grouped kanji characters
-    return kanji_dict
\ No newline at end of file
+    sources = load_sources(data_root_dir)
+    jouyou, hyougai, jinmei, itai = sources['jouyou'], sources['hyougai'], sources['jinmei'], sources['itai']
+
+    # Group the kanji of all the sources, the smallest kanji of a group is the key
+    variant_index = build_variant_index([jouyou, jinmei, hyougai, itai], key=lambda kanji: kanji)
+    return {key: set(group) for key, group in variant_index.groups().items()}
+
+
+def build_variant_index(sources, key=None):
+    """
+    Add the kanji groups of the keys of each source, e.g. '亜/亞', to a VariantIndex.
+
+    Args:
+        sources (list): The dicts returned by load_jouyou(), load_hyougai(), load_jinmei() and load_itai().
+        key: The key of VariantIndex, which chooses the representative kanji of each group.
+
+    Returns:
+        VariantIndex
+    """
+    variant_index = VariantIndex(key)
+    for source in sources:
+        for kanji_str in source:
+            variant_index.add_group([kanji.strip() for kanji in kanji_str.split('/') if kanji.strip()])
+    return variant_index
@@ -1,9 +1,6 @@
-from preparation.jouyou import load_jouyou
-from preparation.jinmei import load_jinmei
-from preparation.hyougai import load_hyougai
-from preparation.itai import load_itai
+from preparation.snapshot import load_sources
+from preparation.loader import build_variant_index
 from util_kana import check_katakana_hirakana
-from collections import Counter
 
 def append_yomi(yomi_dict, kanji_info, source_name, raw_kanji):
     """
@@ -60,22 +57,21 @@ def find_common_stem(target, readings):
         str: The longest common stem, or the full target if no common stem is found.
 
     This function works as follows:
-    1. Start with the full length of the target reading.
-    2. Iteratively reduce the length, checking for common stems.
-    3. For each potential stem, count how many readings start with it.
-    4. If more than one reading starts with the stem, it's considered common.
-    5. Return the longest common stem found, or the full target if none is found.
+    1. Measure the common prefix of the target and each reading, once for each reading.
+    2. A prefix of the target is shared by more than one reading up to the second longest of them.
+    3. If the second longest common prefix isn't empty, it's the longest common stem.
+    4. Return the longest common stem found, or the full target if none is found.
     """
-    max_length = len(target)
-    for length in range(max_length, 0, -1):
-        # Get a potential stem by slicing the target
-        stem = target[:length]
-        # Count how many readings start with this stem
-        # If more than one, it's a common stem
-        if sum(1 for r in readings if r.startswith(stem)) > 1:
-            return stem
-    # If no common stem is found, return the full target
-    return target
+    prefix_lengths = [0, 0]
+    for reading in readings:
+        length = 0
+        for a, b in zip(target, reading):
+            if a != b:
+                break
+            length += 1
+        prefix_lengths.append(length)
+    length = sorted(prefix_lengths)[-2]
+    return target[:length] if length else target
 
 
 def find_kanji_reading(kanji, key, examples):
@@ -89,36 +85,37 @@ def find_kanji_reading(kanji, key, examples):
 
     Returns:
         str: The most probable reading of the kanji.
+
+    The okurigana of an example is the text after the kanji, the longest end of the key which starts the
+    okurigana is removed from the key, e.g. the key あわれむ and the example 哀れみ give あわれ.
     """
-    readings = []
+    # the number of examples of each reading, in the order they are found
+    counts = {}
     for example in examples:
-        if kanji not in example:
+        kanji_index = example.find(kanji)
+        if kanji_index < 0:
             continue
-        
-        kanji_index = example.index(kanji)
-        if kanji_index == len(example) - 1:
-            readings.append(key)
+
+        okurigana_index = kanji_index + 1
+        if okurigana_index == len(example):
+            counts[key] = counts.get(key, 0) + 1
             continue
 
-        sub_container = example[kanji_index+1:]
-        
-        # Find the maximum common substring at the start of sub_container and end of key
-        max_common = ""
-        for i in range(min(len(sub_container), len(key)), 0, -1):
-            if sub_container.startswith(key[-i:]):
-                max_common = key[-i:]
+        # Find the maximum common substring at the start of the okurigana and end of key
+        common_length = 0
+        for i in range(min(len(example) - okurigana_index, len(key)), 0, -1):
+            if example.startswith(key[-i:], okurigana_index):
+                common_length = i
                 break
-        
-        # Remove the common part from key
-        new_key = key[:-len(max_common)]
-        
+
+        # Remove the common part from key, nothing is left if there is no common part
+        new_key = key[:-common_length] if common_length else ''
+
         if new_key != '':
-            readings.append(new_key)
-    
-    # Count occurrences of each reading and return the most common one
-    key = Counter(readings).most_common(1)[0][0] if readings else key
-    
-    return key
+            counts[new_key] = counts.get(new_key, 0) + 1
+
+    # the most common reading, the first found one if several are the most common
+    return max(counts, key=counts.get) if counts else key
 
 def merge_kunyomi(kanji, kunyomi_ori_dict):
     if not kunyomi_ori_dict:
@@ -202,16 +199,18 @@ def load_preparation_data(
         ...
     }
     """
-    # Dictionary to store the mapping between individual kanji and their representative kanji
-    all_kanji_mapping = {}
     # Dictionary to store detailed information for each kanji group
     kanji_info_dict = {}
 
     # Load data from different sources based on the function parameters
-    jouyou = load_jouyou(data_root_dir) if jouyou else {}
-    hyougai = load_hyougai(data_root_dir) if hyougai else {}
-    jinmei = load_jinmei(data_root_dir) if jinmei else {}
-    itai = load_itai(data_root_dir) if itai else {}
+    sources = load_sources(data_root_dir)
+    jouyou = sources['jouyou'] if jouyou else {}
+    hyougai = sources['hyougai'] if hyougai else {}
+    jinmei = sources['jinmei'] if jinmei else {}
+    itai = sources['itai'] if itai else {}
+
+    # The itai groups of all the sources, the first kanji of each group is its representative kanji
+    variant_index = build_variant_index([jouyou, hyougai, jinmei, itai])
 
     # Process and merge data from all sources
     for source, source_name in zip([jouyou, hyougai, jinmei, itai], ["常用", "表外", "人名", "異体"]):
@@ -219,29 +218,29 @@ def load_preparation_data(
             if raw_kanji.strip().strip('/') == '':
                 continue
 
-            # split to kanji list, then get the matched and mismatched kanji in all_kanji_dict
-            kanji_list = [kanji.strip() for kanji in raw_kanji.split('/')]
-            matched = [kanji for kanji in kanji_list if kanji in all_kanji_mapping]
-            mismatched = {kanji: source_name for kanji in list(set(kanji_list) - set(matched))}
-            
-            # Determine the representative kanji for this group
-            kanji_info_key = all_kanji_mapping[matched[0]] if matched else kanji_list[0]
+            # split to kanji list, and determine the representative kanji for this group
+            kanji_list = [kanji.strip() for kanji in raw_kanji.split('/') if kanji.strip()]
+            kanji_info_key = variant_index.find(kanji_list[0])
 
             # Create a new entry in kanji_info_dict if this is a new kanji group
-            if not matched:
+            if kanji_info_key not in kanji_info_dict:
                 kanji_info_dict[kanji_info_key] = {
                     "kanji_dict": {},
                     "yomi": {},
                 }
-            kanji_info_dict[kanji_info_key]['kanji_dict'].update(mismatched)
+
+            # get the matched and mismatched kanji in the group, the source of a kanji is the first one it appears in
+            kanji_dict = kanji_info_dict[kanji_info_key]['kanji_dict']
+            matched = [kanji for kanji in kanji_list if kanji in kanji_dict]
+            mismatched = {kanji: source_name for kanji in list(set(kanji_list) - set(matched))}
+            kanji_dict.update(mismatched)
             
             # Process and append yomi information
             yomi_dict = kanji_info_dict[kanji_info_key]['yomi']
             append_yomi(yomi_dict, kanji_info, source_name, raw_kanji)
 
-            # Update the mapping for all kanji in this group
-            all_kanji_mapping.update({kanji: kanji_info_key for kanji in kanji_list})
-            
+    # The mapping between individual kanji and their representative kanji
+    all_kanji_mapping = {kanji: variant_index.find(kanji) for kanji in variant_index}
 
     for kanji, value in kanji_info_dict.items():
         if '訓読み' in value['yomi']:
@@ -0,0 +1,163 @@
+import os
+import pickle
+import threading
+from file_util import files_signature, files_digest
+from preparation.jouyou import load_jouyou
+from preparation.jinmei import load_jinmei
+from preparation.hyougai import load_hyougai
+from preparation.itai import load_itai
+
+# bump it when the structure of the snapshot changes
+SNAPSHOT_VERSION = 1
+SNAPSHOT_FILE = 'snapshot.pickle'
+
+# the directory of each source in the data root dir, and the function parsing it
+SOURCES = {
+    'jouyou': ['じょうようかんじひょう', load_jouyou],
+    'hyougai': ['ひょうがいかんじじたいひょう', load_hyougai],
+    'jinmei': ['じんめいじょうようかんじひょう', load_jinmei],
+    'itai': ['いたいじ', load_itai],
+}
+
+# {data root dir: (signature, sources)}, the sources loaded by load_sources() in this process
+_loaded_sources = {}
+_loaded_lock = threading.Lock()
+
+
+def source_paths(data_root_dir):
+    """
+    All the files the snapshot is built from: the files of each source directory, and the code parsing them.
+    """
+    paths = []
+    for source_dir, loader in SOURCES.values():
+        source_dir = os.path.join(data_root_dir, source_dir)
+        if os.path.isdir(source_dir):
+            paths.extend(os.path.join(source_dir, name) for name in sorted(os.listdir(source_dir)) if os.path.isfile(os.path.join(source_dir, name)))
+    code_dir = os.path.dirname(os.path.abspath(__file__))
+    paths.extend(os.path.join(code_dir, name) for name in ['utils.py', 'jouyou.py', 'hyougai.py', 'jinmei.py', 'itai.py', 'snapshot.py'])
+    return [os.path.normpath(path) for path in paths]
+
+
+class PreparationSnapshot:
+    """
+    The parsed sources of the preparation data, saved as a single pickle file in the data root dir, so the
+    text files are not read and parsed again by each loader.
+
+    Like ParsedResultCache, the sizes and modification times of the source files are checked first, the
+    contents are only hashed when they differ, and the snapshot is rebuilt when any of them has changed.
+    """
+    def __init__(self, data_root_dir):
+        self.data_root_dir = data_root_dir
+        self.snapshot_path = os.path.join(data_root_dir, SNAPSHOT_FILE)
+        self.input_paths = source_paths(data_root_dir)
+        self._signature = files_signature(self.input_paths)
+        self._digest = None
+
+
+    def _write(self, snapshot):
+        """
+        Save the snapshot, best-effort: if the data root dir isn't writable, e.g. a read-only checkout,
+        the sources are just parsed again next time.
+
+        Returns:
+            bool: True if the snapshot is saved.
+        """
+        tmp_path = self.snapshot_path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as file:
+                pickle.dump(snapshot, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
+        return True
+
+
+    def load(self):
+        """
+        Returns:
+            dict: {source name: the result of its loader}, or None if there is no snapshot or any source has changed.
+        """
+        snapshot = None
+        if os.path.isfile(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, 'rb') as file:
+                    snapshot = pickle.load(file)
+            except Exception:
+                print(f'{self.snapshot_path} is broken, build it again.')
+        if not snapshot or snapshot.get('version') != SNAPSHOT_VERSION:
+            return None
+        if snapshot['signature'] == self._signature:
+            return snapshot['sources']
+
+        self._digest = files_digest(self.input_paths)
+        if snapshot['digest'] != self._digest:
+            return None
+        # touched but not changed, keep the new signature so the contents are not hashed next time
+        snapshot['signature'] = self._signature
+        self._write(snapshot)
+        return snapshot['sources']
+
+
+    def build(self):
+        """
+        Parse all the sources and save them as the snapshot, the parsed sources are returned even if
+        the snapshot can't be saved.
+
+        Returns:
+            dict: {source name: the result of its loader}
+        """
+        sources = {name: loader(self.data_root_dir) for name, (source_dir, loader) in SOURCES.items()}
+        if self._digest is None:
+            self._digest = files_digest(self.input_paths)
+        self._write({
+            'version': SNAPSHOT_VERSION,
+            'signature': self._signature,
+            'digest': self._digest,
+            'sources': sources
+        })
+        return sources
+
+
+def load_sources(data_root_dir):
+    """
+    The parsed preparation sources, from the snapshot if it's up to date, otherwise the snapshot is built first.
+
+    The sources are loaded once for each data root dir and shared by all the loaders in the process, until
+    any source file changes or clear_loaded_sources() is called. They must not be modified.
+
+    Returns:
+        dict: {
+            'jouyou': {'亜/亞': {'ア': '亜流 亜麻 亜熱帯'}, ...},
+            'hyougai': {'穎/頴': {'エイ': ''}, ...},
+            'jinmei': {'祢': {}, ...},
+            'itai': {'亜/亞': {}, ...},
+        }
+    """
+    root_dir = os.path.normpath(os.path.abspath(data_root_dir))
+    with _loaded_lock:
+        snapshot = PreparationSnapshot(data_root_dir)
+        # the sizes and modification times of the files tell if the loaded sources are still up to date
+        loaded = _loaded_sources.get(root_dir)
+        if loaded and loaded[0] == snapshot._signature:
+            return loaded[1]
+
+        sources = snapshot.load()
+        if sources is None:
+            sources = snapshot.build()
+        _loaded_sources[root_dir] = (snapshot._signature, sources)
+        return sources
+
+
+def clear_loaded_sources(data_root_dir=None):
+    """
+    Drop the sources loaded by load_sources() of data_root_dir, or of all the dirs if it's None.
+    """
+    with _loaded_lock:
+        if data_root_dir is None:
+            _loaded_sources.clear()
+        else:
+            _loaded_sources.pop(os.path.normpath(os.path.abspath(data_root_dir)), None)
@@ -1,16 +1,18 @@
 import os
 
 def readfile(dirname):
-    data = []
-    for f in os.listdir(dirname):
+    """
+    Yield the stripped lines of the files in dirname, skipping the empty ones.
+
+    The files are read as UTF-8 one line at a time, in the order of their names, so the order of the
+    lines doesn't depend on the file system.
+    """
+    for f in sorted(os.listdir(dirname)):
         fpath = os.path.join(dirname, f)
         if not os.path.isfile(fpath):
             continue
-        h = open(fpath, 'r')
-        for i in h.readlines():
-            if i.strip() == '':
-                continue
-            data.append(i.strip())
-        h.close()
-    return data
-
+        with open(fpath, 'r', encoding='utf-8') as h:
+            for i in h:
+                if i.strip() == '':
+                    continue
+                yield i.strip()
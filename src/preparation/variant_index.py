@@ -0,0 +1,103 @@
+class VariantIndex:
+    """
+    A disjoint-set (union-find) of the itai (variant) kanji groups, e.g. 亜/亞, 悪/惡.
+
+    The groups of all the sources are added with add_group(), a group sharing any kanji with an earlier one
+    is merged into it. find() gives the representative kanji of the group of a kanji.
+
+    The representative is the kanji with the smallest `key` of the group, by default the kanji added first,
+    so it doesn't change as the groups are merged, e.g. key=lambda kanji: kanji makes the kanji with the
+    smallest unicode value the representative.
+
+    Example:
+        index = VariantIndex()
+        index.add_group(['亜', '亞'])
+        index.find('亞') -> '亜'
+        index.groups() -> {'亜': ['亜', '亞']}
+    """
+    def __init__(self, key=None):
+        self._parent = {}
+        # the order in which the kanji are added, the default key
+        self._order = {}
+        self._key = key
+
+
+    def __contains__(self, kanji):
+        return kanji in self._parent
+
+
+    def __iter__(self):
+        # the kanji in the order they are added
+        return iter(self._order)
+
+
+    def __len__(self):
+        return len(self._parent)
+
+
+    def _rank(self, kanji):
+        return self._key(kanji) if self._key else self._order[kanji]
+
+
+    def add(self, kanji):
+        if kanji not in self._parent:
+            self._parent[kanji] = kanji
+            self._order[kanji] = len(self._order)
+
+
+    def find(self, kanji):
+        """
+        Returns:
+            str: The representative kanji of the group of kanji. KeyError if kanji has never been added.
+        """
+        parent = self._parent
+        # path halving, every kanji on the path is pointed to its grandparent
+        while parent[kanji] != kanji:
+            parent[kanji] = parent[parent[kanji]]
+            kanji = parent[kanji]
+        return kanji
+
+
+    def union(self, kanji_a, kanji_b):
+        """
+        Merge the groups of the two kanji.
+
+        Returns:
+            str: The representative kanji of the merged group.
+        """
+        root_a, root_b = self.find(kanji_a), self.find(kanji_b)
+        if root_a == root_b:
+            return root_a
+        if self._rank(root_b) < self._rank(root_a):
+            root_a, root_b = root_b, root_a
+        self._parent[root_b] = root_a
+        return root_a
+
+
+    def add_group(self, kanji_list):
+        """
+        Add a group of variant kanji, merged with the groups of any kanji already added.
+
+        Returns:
+            str: The representative kanji of the group, None if kanji_list is empty.
+        """
+        if not kanji_list:
+            return None
+        for kanji in kanji_list:
+            self.add(kanji)
+        root = self.find(kanji_list[0])
+        for kanji in kanji_list[1:]:
+            root = self.union(root, kanji)
+        return root
+
+
+    def groups(self):
+        """
+        Returns:
+            dict: {representative: [kanji, ...]}, the groups in the order of their first kanji added, the
+                  kanji of a group in the order they are added.
+        """
+        groups = {}
+        for kanji in self._order:
+            groups.setdefault(self.find(kanji), []).append(kanji)
+        return groups
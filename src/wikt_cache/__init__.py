@@ -1,6 +1,10 @@
+import os
 from file_util import prepare_file_path
 from preparation.loader import load_local_kanji_without_tag
 from wikt_cache.wiki_cache import WikiCache
+from wikt_cache.wiki_html import save_html
+from wikt_cache.cache_store import convert_cache_txt
+from wikt_cache.dump_import import import_dump
 from wikt_cache.ui import confirm_fetch_remote, show_kanji_list, show_brief_info
 
 
@@ -16,25 +20,67 @@ def get_kanji_list(source_data_dir):
     return set(kanji_list)
 
 
-def fetch_wikt_cache(source_data_dir, cache_path, update_flag=False, fetch_missing_only=True):
+def fetch_wikt_cache(source_data_dir, cache_path, update_flag=False, fetch_missing_only=True, workers=1, rate_limit=None, api_url=None, batch_size=1, checkpoint=True, revalidate=True, codec=None, with_html=False):
     prepare_file_path(cache_path)
 
-    wc = WikiCache(cache_path)
+    wc = WikiCache(os.path.dirname(cache_path), api_url, rate_limit, codec)
     cache_info = wc.cache_info()
-    local_kanji_set = get_kanji_list(source_data_dir)
+    # the kanji fixed by patch.txt are not taken from the cache
+    local_kanji_set = get_kanji_list(source_data_dir) - set(wc.patch)
 
     if cache_info is None or not cache_info['kanji_count']:
         cache_kanji_set = set()
     else:
         cache_kanji_set = set(kanji for kanji in cache_info['kanji_list'] if kanji.strip())
-    missing_kanji_set = local_kanji_set - cache_kanji_set
+    # the kanji failed to fetch last time are queued again as missing ones
+    failed_kanji_set = set(wc.failed_keys())
+    if failed_kanji_set:
+        print(f'{len(failed_kanji_set)} kanji failed to fetch last time, they will be fetched again.')
+    missing_kanji_set = (local_kanji_set - cache_kanji_set) | failed_kanji_set
     update_kanji_set = cache_kanji_set - missing_kanji_set
+    revalidate = bool(update_flag and revalidate and update_kanji_set)
     
     show_brief_info(len(local_kanji_set), len(cache_kanji_set), len(missing_kanji_set), fetch_missing_only)
     show_kanji_list(missing_kanji_set, update_kanji_set, fetch_missing_only)
+    if revalidate:
+        print(f'The revisions of the {len(update_kanji_set)} cached kanji are checked first, only the changed ones are fetched again.')
+    # nothing is sent to the remote before it's confirmed, including the revalidation requests
     confirm_fetch_remote()
+
+    if revalidate:
+        # only re-fetch the pages edited since they were cached
+        changed_kanji_list = wc.find_changed(sorted(update_kanji_set), workers)
+        print(f'{len(changed_kanji_list)} of {len(update_kanji_set)} cached kanji have changed pages.')
+        update_kanji_set = set(changed_kanji_list)
+
+    html_writer = None
+    if with_html:
+        # write the html cache in the same pass, as -ht would do
+        html_path = os.path.join(os.path.dirname(cache_path), 'html')
+        prepare_file_path(html_path, is_dir=True, create_if_not_exists=True, delete_if_exists=False)
+        compress_html = codec not in (None, 'none')
+        html_writer = lambda kanji, html_list: save_html(html_path, kanji, html_list, compress_html)
          
     if update_flag:
-        wc.fetch(list(update_kanji_set.union(missing_kanji_set)))
+        wc.fetch(list(update_kanji_set.union(missing_kanji_set)), workers, batch_size, checkpoint, html_writer=html_writer)
     else:
-        wc.fetch(list(missing_kanji_set))
\ No newline at end of file
+        wc.fetch(list(missing_kanji_set), workers, batch_size, checkpoint, html_writer=html_writer)
+
+
+def import_wikt_dump(source_data_dir, cache_path, ja_dump_path=None, zh_dump_path=None, codec=None, api_url=None):
+    prepare_file_path(cache_path)
+
+    wc = WikiCache(os.path.dirname(cache_path), api_url, codec=codec)
+    local_kanji_set = get_kanji_list(source_data_dir)
+    print(f'importing the {len(local_kanji_set)} kanji in the preparation dictionary from the dumps.')
+    count = import_dump(wc, local_kanji_set, ja_dump_path, zh_dump_path)
+    print(f'{count} kanji are imported, the others are not found in the dumps.')
+
+
+def convert_wikt_cache(cache_path, codec=None):
+    if not os.path.isfile(cache_path):
+        print(f'{cache_path} does not exist, nothing to convert.')
+        return
+    cache_dir = os.path.dirname(cache_path)
+    count = convert_cache_txt(cache_path, cache_dir, codec)
+    print(f'{count} kanji are converted to the indexed cache store in {cache_dir}, {cache_path} is no longer used.')
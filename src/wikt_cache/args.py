@@ -1,7 +1,8 @@
 import argparse
 import config
-from wikt_cache import fetch_wikt_cache
+from wikt_cache import fetch_wikt_cache, convert_wikt_cache, import_wikt_dump
 from wikt_cache.wiki_html import fetch_wiki_html
+from wikt_cache.cache_store import CODECS
 
 def boolean_arg(value):
     if value.lower() in ('yes', 'true', 't', 'y', '1'):
@@ -23,6 +24,28 @@ def add_wikt_args(sub_parsers):
         action='store_true',
         help='Wikitext cache will be update or fetch by default. If this argument is specified, html will be updated or fetched.'
     )
+    wikt_parser.add_argument(
+        '-wh', '--with_html',
+        action='store_true',
+        help='Fetch the html together with the wikitext in one pass, the sections are discovered once and fetched in both props by the same requests. Both caches are written.'
+    )
+    wikt_parser.add_argument(
+        '-cv', '--convert_cache',
+        action='store_true',
+        help='Convert the tab-separated cache file to the indexed cache store (cache.idx and cache.dat) in the same directory, which is used instead of it afterwards.'
+    )
+    wikt_parser.add_argument(
+        '-dj', '--ja_dump',
+        type=str,
+        default=None,
+        help='Build the cache from a local ja.wiktionary XML dump (pages-articles, .xml, .bz2 or .gz) instead of the API. Can be used with -dz.'
+    )
+    wikt_parser.add_argument(
+        '-dz', '--zh_dump',
+        type=str,
+        default=None,
+        help='Build the cache from a local zh.wiktionary XML dump instead of the API. Can be used with -dj.'
+    )
     wikt_parser.add_argument(
         '-u', '--update_flag',
         type=boolean_arg,
@@ -47,20 +70,86 @@ def add_wikt_args(sub_parsers):
         default=config.PREPARATION_DIR,
         help=f'Path to the source data directory. (default: {config.PREPARATION_DIR})'
     )
+    wikt_parser.add_argument(
+        '-j', '--workers',
+        type=int,
+        default=config.WIKT_FETCH_WORKERS,
+        help=f'Number of kanji fetched concurrently. 1 means fetching one by one. (default: {config.WIKT_FETCH_WORKERS})'
+    )
+    wikt_parser.add_argument(
+        '-l', '--rate_limit',
+        type=float,
+        default=config.WIKT_RATE_LIMIT,
+        help=f'Max requests per second sent to each wiktionary host, 0 means unlimited. (default: {config.WIKT_RATE_LIMIT})'
+    )
+    wikt_parser.add_argument(
+        '-b', '--batch_size',
+        type=int,
+        default=config.WIKT_BATCH_SIZE,
+        help=f'Number of kanji whose sections are discovered and fetched together, at most 50. 1 means fetching sections page by page. (default: {config.WIKT_BATCH_SIZE})'
+    )
+    wikt_parser.add_argument(
+        '-k', '--checkpoint',
+        type=boolean_arg,
+        default=True,
+        help='Append each fetched kanji to a journal file at once, so an interrupted fetching can be resumed by running it again. The journal is merged into the cache file at the end. (default: True)'
+    )
+    wikt_parser.add_argument(
+        '-rv', '--revalidate',
+        type=boolean_arg,
+        default=True,
+        help='With -u, ask the API for the current revision ids of the cached pages first, and only re-fetch the kanji whose pages changed. (default: True)'
+    )
+    wikt_parser.add_argument(
+        '-z', '--compress',
+        type=str,
+        choices=CODECS,
+        default=None,
+        help='Compress each entry of the cache store with this codec, zstd needs the zstandard package. The existing entries are recompressed. With -ht, any codec but none saves the html files as gzipped .json.gz files. (default: keep the current codec)'
+    )
+    wikt_parser.add_argument(
+        '-url', '--api_url',
+        type=str,
+        default=config.WIKT_API_URL,
+        help=f'API url template, %%s is replaced by the language code. Set it to a local server for testing. (default: {config.WIKT_API_URL})'
+    )
 
 def process_wikt_wrapper(args):
-    if not args.update_html:
+    if args.convert_cache:
+        convert_wikt_cache(args.cache_path, args.compress)
+    elif args.ja_dump or args.zh_dump:
+        import_wikt_dump(
+            source_data_dir=args.source_data_dir,
+            cache_path=args.cache_path,
+            ja_dump_path=args.ja_dump,
+            zh_dump_path=args.zh_dump,
+            codec=args.compress,
+            api_url=args.api_url
+        )
+    elif not args.update_html:
         fetch_wikt_cache(
             source_data_dir=args.source_data_dir,
             cache_path=args.cache_path,
             update_flag=args.update_flag,
-            fetch_missing_only=args.fetch_missing_only
+            fetch_missing_only=args.fetch_missing_only,
+            workers=args.workers,
+            rate_limit=args.rate_limit,
+            api_url=args.api_url,
+            batch_size=args.batch_size,
+            checkpoint=args.checkpoint,
+            revalidate=args.revalidate,
+            codec=args.compress,
+            with_html=args.with_html
         )
     else:
         fetch_wiki_html(
             cache_path=config.WIKT_CACHE_DIR,
             update_flag=args.update_flag,
-            fetch_missing_only=args.fetch_missing_only
+            fetch_missing_only=args.fetch_missing_only,
+            compress=args.compress not in (None, 'none'),
+            workers=args.workers,
+            rate_limit=args.rate_limit,
+            api_url=args.api_url
         )
 
 def regist_wiktionary(sub_parsers):
@@ -0,0 +1,296 @@
+import os
+import json
+import mmap
+import zlib
+from collections.abc import MutableMapping
+
+INDEX_HEADER = '# wikt cache index v1\n'
+# the codec of a compressed store is kept in the header, e.g. '# wikt cache index v2 zlib'
+INDEX_HEADER_V2 = '# wikt cache index v2 %s\n'
+CODECS = ['none', 'zlib', 'zstd']
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+# appended to the values of a kanji failed to fetch, the values before it are kept from the last good fetch
+FAILED_MARKER = '#fetch failed'
+
+
+def encode_line(key, values):
+    """
+    Encode an entry to a line of the tab-separated cache.txt format.
+    """
+    values = [x.replace('\t', '') for x in values]
+    s = '\t'.join([key] + values) + '\n'
+    s = s.replace('\n', '\\n').replace('\r', '\\r')
+    return s + '\n'
+
+
+def decode_line(line):
+    """
+    Decode a line of the tab-separated cache.txt format to the kanji and its values.
+    """
+    key, *values = line.strip().replace('\\n', '\n').replace('\\r', '\r').split('\t')
+    return key, values
+
+
+def _zstandard():
+    # zstd is optional, zlib of the standard library works without any extra package
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError('The zstd codec needs the zstandard package, run `pip install zstandard` or use zlib.')
+    return zstandard
+
+
+def compress_record(data, codec):
+    if codec == 'zlib':
+        return zlib.compress(data, 6)
+    if codec == 'zstd':
+        return _zstandard().ZstdCompressor(level=3).compress(data)
+    return data
+
+
+def decompress_record(data):
+    """
+    Decompress a record of any codec. The codec is told by the first bytes, a plain JSON record starts
+    with '[', a zlib stream with 0x78 and a zstd frame with its magic number, so records of different
+    codecs can be mixed in one cache.dat.
+    """
+    if data[:1] == b'[':
+        return data
+    if data[:4] == _ZSTD_MAGIC:
+        return _zstandard().ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def is_failed(values):
+    return len(values) > 3 and values[3] == FAILED_MARKER
+
+
+class CacheStore(MutableMapping):
+    """
+    An indexed on-disk store of the wiktionary cache, used in place of the tab-separated cache.txt.
+
+    The store is made of two files in the cache directory:
+        cache.dat: the records, each one is the UTF-8 JSON list of the values of a kanji. Records are only
+                   appended, a rewritten kanji leaves its old record behind until compact() is called.
+                   With the zlib or zstd codec every record is compressed on its own, so a single kanji
+                   is still read without decompressing the others.
+        cache.idx: a small text index sorted by kanji, one 'kanji<TAB>offset<TAB>length' line for each kanji.
+
+    Only the index is loaded, the records are read from a memory-mapped cache.dat when they are accessed.
+    So a single kanji lookup or a listing of all kanji does not need to read or unescape any wikitext.
+
+    Written values are kept in memory until flush() appends them to cache.dat and rewrites the index.
+
+    Attributes:
+        data_path (str): Path to cache.dat.
+        index_path (str): Path to cache.idx.
+        exclude (set): Kanji hidden from the mapping, e.g. the kanji fixed by patch.txt.
+        codec (str): Codec of the written records, one of CODECS. None keeps the codec of the existing store.
+    """
+    def __init__(self, cache_dir, exclude=(), codec=None):
+        if codec and codec not in CODECS:
+            raise ValueError(f'Unknown codec: {codec}, it should be one of {CODECS}')
+        if codec == 'zstd':
+            _zstandard()
+        self.data_path = os.path.join(cache_dir, 'cache.dat')
+        self.index_path = os.path.join(cache_dir, 'cache.idx')
+        self.exclude = set(exclude)
+        self._index, stored_codec = self._load_index()
+        self.codec = codec or stored_codec
+        # the existing records are to be recompressed with the new codec by compact()
+        self._recode = self.codec != stored_codec and bool(self._index)
+        self._pending = {}
+        self._file = None
+        self._mmap = None
+
+
+    @staticmethod
+    def exists(cache_dir):
+        return os.path.isfile(os.path.join(cache_dir, 'cache.idx'))
+
+
+    def _load_index(self):
+        index = {}
+        if not os.path.isfile(self.index_path):
+            return index, 'none'
+        with open(self.index_path, 'r', encoding='utf-8') as file:
+            header = file.readline()
+            codec = header.split()[-1] if header.strip() else ''
+            if header != INDEX_HEADER and (header != INDEX_HEADER_V2 %codec or codec not in CODECS):
+                raise ValueError(f'Unknown cache index format: {self.index_path}')
+            if header == INDEX_HEADER:
+                codec = 'none'
+            for line in file:
+                key, offset, length = line.rstrip('\n').split('\t')
+                index[key] = (int(offset), int(length))
+        return index, codec
+
+
+    def _map(self, end):
+        # remap when the record is beyond the mapped size, e.g. cache.dat is appended by flush()
+        if self._mmap is not None and end <= len(self._mmap):
+            return self._mmap
+        self.close()
+        self._file = open(self.data_path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+
+    def _read(self, key):
+        offset, length = self._index[key]
+        data = self._map(offset + length)[offset:offset+length]
+        return json.loads(decompress_record(data).decode('utf-8'))
+
+
+    def __getitem__(self, key):
+        if key in self.exclude:
+            raise KeyError(key)
+        if key in self._pending:
+            return self._pending[key]
+        if key not in self._index:
+            raise KeyError(key)
+        return self._read(key)
+
+
+    def __setitem__(self, key, values):
+        self._pending[key] = list(values)
+
+
+    def __delitem__(self, key):
+        if key not in self._pending and key not in self._index:
+            raise KeyError(key)
+        self._pending.pop(key, None)
+        self._index.pop(key, None)
+
+
+    def __contains__(self, key):
+        return key not in self.exclude and (key in self._pending or key in self._index)
+
+
+    def __iter__(self):
+        for key in self.all_keys():
+            if key not in self.exclude:
+                yield key
+
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+    def all_keys(self):
+        """
+        All the kanji of the store including the excluded ones, in sorted order.
+        """
+        return sorted(set(self._index).union(self._pending))
+
+
+    def data_size(self):
+        return os.path.getsize(self.data_path) if os.path.isfile(self.data_path) else 0
+
+
+    def stale_size(self):
+        """
+        Bytes of cache.dat taken by the records which are no longer indexed.
+        """
+        return self.data_size() - sum(length for offset, length in self._index.values())
+
+
+    def needs_compact(self):
+        """
+        Whether compact() should be called, i.e. the old records take more space than the live ones, or
+        the codec is changed and the existing records should be recompressed.
+        """
+        if self._recode:
+            return True
+        return self.stale_size() > self.data_size() // 2
+
+
+    def _encode_record(self, values):
+        return compress_record(json.dumps(values, ensure_ascii=False).encode('utf-8'), self.codec)
+
+
+    def _get_values(self, key):
+        return self._pending[key] if key in self._pending else self._read(key)
+
+
+    def flush(self):
+        """
+        Append the pending records to cache.dat and atomically rewrite the index.
+        """
+        if self._pending:
+            with open(self.data_path, 'ab') as file:
+                offset = file.tell()
+                for key, values in self._pending.items():
+                    data = self._encode_record(values)
+                    file.write(data)
+                    self._index[key] = (offset, len(data))
+                    offset += len(data)
+                file.flush()
+                os.fsync(file.fileno())
+            self._pending = {}
+        self._write_index()
+
+
+    def _write_index(self):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            # an uncompressed store keeps the v1 header, which older versions can read
+            file.write(INDEX_HEADER if self.codec == 'none' else INDEX_HEADER_V2 %self.codec)
+            for key in sorted(self._index):
+                offset, length = self._index[key]
+                file.write(f'{key}\t{offset}\t{length}\n')
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.index_path)
+
+
+    def compact(self):
+        """
+        Rewrite cache.dat in kanji order with only the live records, which drops the records left behind
+        by rewritten kanji, and merges the pending records. All the records are written with the current codec.
+        """
+        tmp_path = self.data_path + '.tmp'
+        index = {}
+        with open(tmp_path, 'wb') as file:
+            offset = 0
+            for key in self.all_keys():
+                data = self._encode_record(self._get_values(key))
+                file.write(data)
+                index[key] = (offset, len(data))
+                offset += len(data)
+            file.flush()
+            os.fsync(file.fileno())
+        self.close()
+        os.replace(tmp_path, self.data_path)
+        self._index = index
+        self._pending = {}
+        self._recode = False
+        self._write_index()
+
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def convert_cache_txt(cache_txt_path, cache_dir, codec=None):
+    """
+    Convert a tab-separated cache.txt to the indexed store in cache_dir. cache.txt itself is kept untouched.
+
+    Returns:
+        int: Number of converted kanji.
+    """
+    store = CacheStore(cache_dir, codec=codec)
+    with open(cache_txt_path, 'r') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            key, values = decode_line(line)
+            store[key] = values
+    store.compact()
+    store.close()
+    return len(store.all_keys())
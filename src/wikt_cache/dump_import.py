@@ -0,0 +1,115 @@
+import bz2
+import gzip
+import xml.etree.ElementTree as ET
+from wikt_cache.wikitext_sections import split_sections, section_text, select_ja_sections, select_zh_sections
+
+def _open_dump(dump_path):
+    if dump_path.endswith('.bz2'):
+        return bz2.open(dump_path, 'rb')
+    if dump_path.endswith('.gz'):
+        return gzip.open(dump_path, 'rb')
+    return open(dump_path, 'rb')
+
+
+def iter_dump_pages(dump_path, titles):
+    """
+    Stream the pages of a MediaWiki XML dump (pages-articles, plain, .bz2 or .gz), yielding
+    (title, wikitext, revid) for each main namespace page whose title is in `titles`.
+
+    The dump is parsed incrementally and each page is dropped once it's read, so the memory used does
+    not depend on the size of the dump. Redirect pages are skipped.
+    """
+    with _open_dump(dump_path) as file:
+        context = ET.iterparse(file, events=('start', 'end'))
+        root = None
+        for event, element in context:
+            if root is None:
+                root = element
+            if event != 'end' or element.tag.rsplit('}', 1)[-1] != 'page':
+                continue
+
+            page = {child.tag.rsplit('}', 1)[-1]: child for child in element}
+            # the <id> of <page> is the page id, the revision id is the <id> of <revision>
+            revision = {}
+            if 'revision' in page:
+                revision = {child.tag.rsplit('}', 1)[-1]: child.text for child in page['revision']}
+            title = page['title'].text if 'title' in page else None
+            namespace = page['ns'].text if 'ns' in page else None
+            is_redirect = 'redirect' in page
+            # drop the page which has been read, including the reference the root keeps
+            root.clear()
+
+            if namespace != '0' or is_redirect or title not in titles:
+                continue
+            revid = int(revision['id']) if revision.get('id') else None
+            yield title, revision.get('text') or '', revid
+
+
+class DumpExtractor:
+    """
+    Extract the pronunciation sections from the dumped wikitext, with the same keyword logic as
+    Agent.fetch(), so the values are the same as the ones fetched by the API.
+
+    The dump has no rendered headings, the headings using templates (e.g. '{{ja}}') are resolved by
+    resolve_anchors(headings, lang), e.g. WikiCache.resolve_anchors(), which expands the ones not seen
+    before by the API and keeps the results in the cache dir.
+    """
+    def __init__(self, resolve_anchors):
+        self._resolve_anchors = resolve_anchors
+
+
+    def extract(self, kanji, wikitext, lang):
+        """
+        Returns:
+            list: The texts of the selected sections of the page, '' for a section not found.
+                  2 texts for a ja page (日本語, 中国語), any number for a zh page.
+        """
+        sections = split_sections(wikitext)
+        anchors = self._resolve_anchors([section[2] for section in sections], lang)
+        sections_map = [[anchors.get(heading, ''), index] for index, level, heading, start, end in sections]
+        if lang == 'ja':
+            indices_list = select_ja_sections(kanji, sections_map)
+        else:
+            indices_list = select_zh_sections(kanji, sections_map)
+        return [section_text(wikitext, sections, item[0]) if item else '' for item in indices_list]
+
+
+def import_dump(wiki_cache, kanji_set, ja_dump_path=None, zh_dump_path=None):
+    """
+    Build the cache of kanji_set from the ja and zh wiktionary dumps, and save it in bulk.
+
+    The kanji found in neither dump are left untouched. If only one dump is given, the texts of the other
+    language are kept from the existing cache. The headings using templates are expanded by the API of
+    wiki_cache, only the ones not expanded before, which takes a few requests in all.
+
+    Returns:
+        int: Number of imported kanji.
+    """
+    extractor = DumpExtractor(wiki_cache.resolve_anchors)
+    texts = {'ja': {}, 'zh': {}}
+    revids = {'ja': {}, 'zh': {}}
+    for lang, dump_path in [['ja', ja_dump_path], ['zh', zh_dump_path]]:
+        if not dump_path:
+            continue
+        for count, (kanji, wikitext, revid) in enumerate(iter_dump_pages(dump_path, kanji_set), start=1):
+            texts[lang][kanji] = extractor.extract(kanji, wikitext, lang)
+            revids[lang][kanji] = revid
+            if count % 1000 == 0:
+                print(f'{count} {lang} pages read.')
+        print(f'{len(texts[lang])} {lang} pages are found in {dump_path}.')
+
+    imported_kanji = sorted(set(texts['ja']).union(texts['zh']))
+    for kanji in imported_kanji:
+        cached = wiki_cache.wiki_dict.get(kanji, ['', '', ''])
+        cached_revisions = wiki_cache.revisions.get(kanji, {})
+        # a page missing from a given dump is missing from the site as well
+        ja_texts = texts['ja'].get(kanji, ['', '']) if ja_dump_path else cached[:2]
+        zh_text = '\n\n'.join(texts['zh'].get(kanji, [])) if zh_dump_path else cached[2]
+        wiki_cache.wiki_dict[kanji] = [ja_texts[0], ja_texts[1], zh_text]
+        wiki_cache.revisions[kanji] = {
+            'ja': revids['ja'].get(kanji) if ja_dump_path else cached_revisions.get('ja'),
+            'zh': revids['zh'].get(kanji) if zh_dump_path else cached_revisions.get('zh'),
+        }
+    # the journal of an interrupted fetching has been loaded, it's merged and removed as well
+    wiki_cache.compact()
+    return len(imported_kanji)
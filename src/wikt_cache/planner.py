@@ -0,0 +1,25 @@
+def plan_batches(kanji_list, batch_size):
+    """
+    Group kanji into batches for the batched fetching of Agent.fetch_batch.
+
+    The MediaWiki API accepts at most 50 titles in one query, so batch_size is capped at 50.
+    Duplicated and empty kanji are dropped, the order of kanji_list is kept.
+
+    Example:
+        Input:
+            kanji_list = ['亜', '哀', '亜', '愛'], batch_size = 2
+        Output:
+            [['亜', '哀'], ['愛']]
+    """
+    batch_size = max(1, min(batch_size, 50))
+    unique_kanji = [kanji for kanji in dict.fromkeys(kanji_list) if kanji.strip()]
+    return [unique_kanji[start:start+batch_size] for start in range(0, len(unique_kanji), batch_size)]
+
+
+def fan_out(batch_results):
+    """
+    Flatten the results of each batch back to (kanji, result) pairs, in the order the batches were fetched.
+    """
+    for batch, result in batch_results:
+        for kanji in batch:
+            yield kanji, result[kanji]
@@ -1,40 +1,133 @@
 import urllib3
 import json
+import random
+import time
 import traceback
+from wikt_cache.throttle import RateLimiter, CircuitBreaker
+from wikt_cache.wikitext_sections import split_sections, section_text, heading_anchor, select_ja_sections, select_zh_sections
 
 
 #Wikimedia API Document location: https://en.wiktionary.org/w/api.php
 #https://ja.wiktionary.org/w/api.php?action=parse&page=%E5%8F%B6&noimages=true&format=json&prop=sections
 #https://ja.wiktionary.org/w/api.php?action=parse&page=%E5%8F%B6&noimages=true&format=json&prop=wikitext&section=4
+#https://ja.wiktionary.org/w/api.php?action=query&prop=revisions&rvprop=content&rvslots=main&formatversion=2&format=json&titles=%E5%8F%B6|%E6%88%AE
 #https://github.com/5j9/wikitextparser
 #https://github.com/earwig/mwparserfromhell/
 
+class FetchError(Exception):
+    """
+    A request failed even after retrying, e.g. the server is down or keeps throttling. It's different from
+    a missing page, so the kanji is marked as failed instead of being cached as an empty entry.
+    """
+    pass
+
+
 # A agent class which is used to map to remote wiktionary.org page to local object
 class Agent():
     _url = 'https://%s.wiktionary.org/w/api.php'
+    _max_retries = 5
+    _backoff = 1.0          # seconds before the first retry, doubled for each retry
+    _max_backoff = 60.0
+    _maxlag = 5             # ask the servers to refuse the requests when the replication lag is high
+    _retry_statuses = [429, 500, 502, 503, 504]
     _fields = {'action': 'parse', 
             'page': '', 
             'format': 'json', 
             'prop': 'sections'}
-    
-    _ja_section_keywords = ['日本語', '中国語']   # ja.wiktionary.org
-    _zh_section_parent_keywords = ['汉语', '漢語', '汉语族', '漢語族', '汉字', '漢字']   # zh.wiktionary.org
-    _zh_section_child_keywords = ["發音", "发音", "讀音", '讀法', '读法', "读音", "拼音"]
 
-    def __init__(self):
-        self.__http = urllib3.PoolManager()
+    def __init__(self, url=None, rate_limit=None, pool_size=1, anchors=None):
+        """
+        Args:
+            url (str): API url template, '%s' is replaced by the language code. Point it to a local
+                       stand-in server for testing. Defaults to the wiktionary.org API.
+            rate_limit (float): Maximum requests per second for each host. None means unlimited.
+            pool_size (int): Number of pooled connections kept for each host, which should be
+                             equal to the number of threads sharing this agent.
+            anchors (dict): {'ja': {heading: anchor}, 'zh': {...}}, the headings resolved before, e.g. loaded
+                            from the cache dir. It's filled by resolve_anchors() in place.
+        """
+        if url:
+            self._url = url
+        # urllib3.PoolManager is thread-safe, all the worker threads share its connections
+        self.__http = urllib3.PoolManager(maxsize=pool_size, block=True)
+        self.__limiter = RateLimiter(rate_limit)
+        # shared by all the threads, so an unhealthy upstream pauses the whole fetching
+        self.__breaker = CircuitBreaker()
+        # rendered anchor of each raw heading, e.g. '{{ja}}' -> '日本語', shared by all batches
+        self.__anchors = anchors if anchors is not None else {'ja': {}, 'zh': {}}
+
+
+    def _request(self, lang, fields, method='GET'):
+        """
+        Send a request to the API of the given language and return the decoded JSON.
+
+        Connection errors, 429/5xx responses and maxlag errors are retried with exponential backoff, or
+        after the Retry-After seconds given by the server. FetchError is raised when all retries failed,
+        or the server returned another status. API errors like a missing page are returned as they are.
+        """
+        url = self._url %lang
+        host = urllib3.util.parse_url(url).host
+        fields = dict(fields, maxlag=self._maxlag)
+        # POST fields are sent url-encoded as the API expects, not as multipart
+        options = {'encode_multipart': False} if method == 'POST' else {}
+        for attempt in range(self._max_retries + 1):
+            self.__breaker.wait()
+            self.__limiter.wait(host)
+            retry_after, reason = None, None
+            try:
+                hdlr = self.__http.request(method, url, fields=fields, retries=False, timeout=60.0, **options)
+            except urllib3.exceptions.HTTPError as e:
+                hdlr, reason = None, repr(e)
+
+            if hdlr is not None and hdlr.status == 200:
+                try:
+                    result = json.loads(hdlr.data.decode('utf-8'))
+                    if result.get('error', {}).get('code') != 'maxlag':
+                        self.__breaker.record_success()
+                        return result
+                    reason = 'maxlag: ' + result['error'].get('info', '')
+                except ValueError as e:
+                    reason = 'bad json: ' + repr(e)
+                retry_after = self._retry_after(hdlr)
+            elif hdlr is not None:
+                if hdlr.status not in self._retry_statuses:
+                    raise FetchError(f'{host} returned status {hdlr.status}')
+                reason = f'status {hdlr.status}'
+                retry_after = self._retry_after(hdlr)
+                if hdlr.status == 429 and retry_after:
+                    # the host is throttling us, it's no use for the other threads to keep trying
+                    self.__breaker.hold(retry_after)
+
+            self.__breaker.record_failure()
+            if attempt == self._max_retries:
+                break
+            delay = retry_after or min(self._max_backoff, self._backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+            print(f'{host} request failed ({reason}), retry in {delay:.1f} seconds.')
+            time.sleep(delay)
+        raise FetchError(f'{host} request failed after {self._max_retries} retries: {reason}')
+
+
+    @staticmethod
+    def _retry_after(hdlr):
+        # only the delay-seconds form is used by mediawiki
+        try:
+            return float(hdlr.headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            return None
 
 
-    def _fetch_sections(self, kanji, lang):
+    def _fetch_sections(self, kanji, lang, revisions=None):
         fields = {x: y for x, y in self._fields.items()}
         fields['page'] = kanji
 
         fetched_sections = []
         try:
-            hdlr = self.__http.request('GET', self._url %lang, fields=fields)
-            if hdlr.status != 200:
-                raise Exception('Return value is not 200')
-            fetched_sections = json.loads(hdlr.data.decode('utf-8'))['parse']['sections']
+            parsed = self._request(lang, fields)['parse']
+            fetched_sections = parsed['sections']
+            if revisions is not None:
+                revisions[lang] = parsed.get('revid')
+        except FetchError:
+            raise
         except Exception:
             traceback.print_exc()
             fetched_sections = []
@@ -58,7 +151,12 @@ class Agent():
 
 
     def _fetch_pronunciation(self, kanji, index_lang, prop):
+        """
+        Fetch a section in the given prop. Several props can be fetched by one request, e.g. 'wikitext|text',
+        then a dict of each prop and its text is returned.
+        """
         index, lang = index_lang
+        props = prop.split('|')
 
         fields = {x: y for x, y in self._fields.items()}
         fields.update({
@@ -68,84 +166,26 @@ class Agent():
         })
 
         try:
-            hdlr = self.__http.request('GET', self._url %lang, fields=fields)
-            if hdlr.status != 200:
-                raise Exception('Return value is not 200')
-            return json.loads(hdlr.data.decode('utf-8'))['parse'][prop]['*']
+            parsed = self._request(lang, fields)['parse']
+            if len(props) == 1:
+                return parsed[prop]['*']
+            return {x: parsed[x]['*'] for x in props}
+        except FetchError:
+            raise
         except Exception:
             traceback.print_exc()
-            return ''
-
-
-    def _get_ja_sections(self, kanji):
-        sections_map = self._fetch_sections(kanji, 'ja')
-
-        keywords_indices = []
-        for keyword in self._ja_section_keywords:
-            keyword_index= None
-            for anchor, index in sections_map:
-                if keyword == anchor:
-                    keyword_index = index
-                    break
-            if keyword_index:
-                keywords_indices.append([keyword_index, 'ja'])
-            else:
-                keywords_indices.append(None)
- 
-        if not keywords_indices:
-            print(kanji, 'no ja sections found', sections_map)
-        return keywords_indices
-    
-
-    def _get_zh_sections(self, kanji):
-        sections_map = self._fetch_sections(kanji, 'zh')
-
-        keyword_indices = []
-        for parent_keyword in self._zh_section_parent_keywords:
-            keyword_index_list = []
-            found_parent = False
-            for anchor, index in sections_map:
-                # find parent keyword
-                if parent_keyword == anchor:
-                    found_parent = True
-                    continue
-                if not found_parent:
-                    continue
-                
-                # when another parent keyword is found, break the loop, enter the next parent keyword loop
-                if anchor in self._zh_section_parent_keywords:
-                    found_parent = False
-                    break
-                
-                # find child keyword after the parent keyword and before the next parent keyword
-                for child_keyword in self._zh_section_child_keywords:
-                    if anchor.startswith(child_keyword):
-                        keyword_index_list.append(index)
-                        break
-            
-            keyword_indices.append(keyword_index_list if keyword_index_list else None)
-        
-        # if none keyword is found, try to find a keyword without parent
-        if all([i == None for i in keyword_indices]):
-            for anchor, index in sections_map:
-                if anchor in self._zh_section_child_keywords:
-                    keyword_indices = [[index]]
-                    break
-                
-        result = []
-        for index_list in keyword_indices:
-            if index_list:
-                result = [[index, 'zh'] for index in index_list]
-                break
-        if not result:
-            print(kanji, 'no zh sections found', sections_map)
+            return '' if len(props) == 1 else {x: '' for x in props}
 
-        return result
+
+    def _get_ja_sections(self, kanji, revisions=None):
+        return select_ja_sections(kanji, self._fetch_sections(kanji, 'ja', revisions))
 
 
-    def fetch(self, kanji, prop='wikitext'):
-        indices_list = self._get_ja_sections(kanji)
-        indices_list.extend(self._get_zh_sections(kanji))
+    def _get_zh_sections(self, kanji, revisions=None):
+        return select_zh_sections(kanji, self._fetch_sections(kanji, 'zh', revisions))
+
+
+    def _collect_pronunciation(self, kanji, indices_list, fetch_section):
         if any([i == None for i in indices_list if i]):
             print(f'{kanji} has no pronunciation: {indices_list}')
 
@@ -154,10 +194,215 @@ class Agent():
             if not item:
                 pronunciation_list.append('')
                 continue
-            pronunciation_list.append(self._fetch_pronunciation(kanji, item, prop))
+            pronunciation_list.append(fetch_section(item))
             
         return [
             pronunciation_list[0],
             pronunciation_list[1],
             '\n\n'.join(pronunciation_list[2:]) 
-        ] 
\ No newline at end of file
+        ]
+
+
+    def _collect_props(self, kanji, indices_list, fetch_section, prop):
+        """
+        Same as _collect_pronunciation() for a single prop. For several props, e.g. 'wikitext|text', each
+        section is fetched only once for all of them, and {prop: [ja_text, zh_text1, zh_text2]} is returned.
+        """
+        props = prop.split('|')
+        if len(props) == 1:
+            return self._collect_pronunciation(kanji, indices_list, fetch_section)
+
+        fetched = {}
+        def fetch_once(item):
+            key = tuple(item)
+            if key not in fetched:
+                fetched[key] = fetch_section(item)
+            return fetched[key]
+
+        return {x: self._collect_pronunciation(kanji, indices_list, lambda item: fetch_once(item)[x]) for x in props}
+
+
+    def fetch(self, kanji, prop='wikitext', revisions=None):
+        """
+        Fetch the pronunciation sections of a kanji.
+
+        With several props, e.g. 'wikitext|text', the sections are discovered once and each section is fetched
+        in all the props by one request, a dict of each prop and its [ja_text, zh_text1, zh_text2] is returned.
+
+        If a dict is passed as revisions, the revision ids of the fetched ja and zh pages are stored in it,
+        e.g. {'ja': 1960841, 'zh': 8231764}. The id is None when the page is missing.
+
+        Raises FetchError when a request failed even after retrying.
+        """
+        indices_list = self._get_ja_sections(kanji, revisions)
+        indices_list.extend(self._get_zh_sections(kanji, revisions))
+        return self._collect_props(kanji, indices_list, lambda item: self._fetch_pronunciation(kanji, item, prop), prop)
+
+
+    def _query_revisions(self, kanji_list, lang, rvprop):
+        """
+        Query the latest revision of up to 50 pages in a single request.
+
+        Returns:
+            dict: page title (kanji) as key, the revision object of the API as value, None for a missing page.
+                  Pages failed to query are not included.
+        """
+        fields = {
+            'action': 'query',
+            'prop': 'revisions',
+            'rvprop': rvprop,
+            'rvslots': 'main',
+            'titles': '|'.join(kanji_list),
+            'format': 'json',
+            'formatversion': '2'
+        }
+        try:
+            result = self._request(lang, fields)['query']
+        except FetchError:
+            raise
+        except Exception:
+            traceback.print_exc()
+            return {}
+
+        # the API may normalize titles, map them back to the requested ones
+        normalized = {item['to']: item['from'] for item in result.get('normalized', [])}
+        revisions = {}
+        for page in result.get('pages', []):
+            title = normalized.get(page['title'], page['title'])
+            if page.get('missing') or not page.get('revisions'):
+                revisions[title] = None
+                continue
+            revisions[title] = page['revisions'][0]
+        return revisions
+
+
+    def _query_pages(self, kanji_list, lang, revisions=None):
+        """
+        Fetch the whole wikitext of up to 50 pages in a single request.
+
+        Returns:
+            dict: page title (kanji) as key, wikitext as value. Missing pages are not included.
+        """
+        pages = {}
+        for title, revision in self._query_revisions(kanji_list, lang, 'ids|content').items():
+            if revisions is not None:
+                revisions[title] = revision['revid'] if revision else None
+            if revision:
+                pages[title] = revision['slots']['main']['content']
+        return pages
+
+
+    def fetch_revisions(self, kanji_list):
+        """
+        Query the current revision ids of the ja and zh pages of a batch of kanji (at most 50), without
+        fetching any content, so the cached pages can be revalidated with only 2 requests per batch.
+
+        Returns:
+            dict: kanji as key, {'ja': revid, 'zh': revid} as value, a revid is None for a missing page.
+                  Kanji failed to query are not included.
+        """
+        result = {}
+        try:
+            queried = {lang: self._query_revisions(kanji_list, lang, 'ids') for lang in ['ja', 'zh']}
+        except FetchError:
+            traceback.print_exc()
+            return result
+        for kanji in kanji_list:
+            if kanji not in queried['ja'] or kanji not in queried['zh']:
+                continue
+            result[kanji] = {}
+            for lang in ['ja', 'zh']:
+                revision = queried[lang][kanji]
+                result[kanji][lang] = revision['revid'] if revision else None
+        return result
+
+
+    def resolve_anchors(self, headings, lang):
+        """
+        Fill the anchor cache for the given raw headings.
+
+        Headings using templates (e.g. '{{ja}}') are expanded by one `action=expandtemplates` request for all
+        of them. As the same few headings are used by almost every page, later batches rarely need a request.
+
+        Returns:
+            dict: {heading: anchor} of all the headings of lang resolved so far.
+        """
+        anchors = self.__anchors[lang]
+        unknown = sorted(set(heading for heading in headings if heading not in anchors))
+        templates = [heading for heading in unknown if '{{' in heading]
+        for heading in unknown:
+            if heading not in templates:
+                anchors[heading] = heading_anchor(heading)
+        if not templates:
+            return anchors
+
+        separator = '\n@@SECTION@@\n'
+        fields = {
+            'action': 'expandtemplates',
+            'prop': 'wikitext',
+            'text': separator.join(templates),
+            'format': 'json'
+        }
+        try:
+            expanded = self._request(lang, fields, method='POST')['expandtemplates']['wikitext'].split(separator.strip())
+        except FetchError:
+            raise
+        except Exception:
+            traceback.print_exc()
+            expanded = []
+        if len(expanded) != len(templates):
+            # leave them unresolved, so they are tried again with the next batch
+            print(lang, 'expand headings error', templates)
+            return anchors
+        for heading, text in zip(templates, expanded):
+            anchors[heading] = heading_anchor(text)
+        return anchors
+
+
+    def fetch_batch(self, kanji_list, prop='wikitext', revisions=None):
+        """
+        Fetch the pronunciation sections of a batch of kanji (at most 50) with a few requests.
+
+        The wikitext of all pages is fetched by one query request for each language, the sections are then
+        located locally, so for prop 'wikitext' no more request is needed. Other props, e.g. 'text', are still
+        fetched section by section through `action=parse`, with the section indices discovered in batch.
+        With several props, e.g. 'wikitext|text', the values are dicts of each prop as fetch() returns.
+
+        If a dict is passed as revisions, the revision ids of each kanji are stored in it as fetch() does,
+        with kanji as key. Raises FetchError when a request failed even after retrying.
+
+        Returns:
+            dict: kanji as key, the same [ja_text, zh_text1, zh_text2] list as fetch() as value.
+        """
+        pages, sections, revids = {}, {}, {}
+        for lang in ['ja', 'zh']:
+            revids[lang] = {}
+            pages[lang] = self._query_pages(kanji_list, lang, revids[lang])
+            sections[lang] = {kanji: split_sections(text) for kanji, text in pages[lang].items()}
+            self.resolve_anchors([section[2] for item in sections[lang].values() for section in item], lang)
+
+        def sections_map(kanji, lang):
+            anchors = self.__anchors[lang]
+            return [[anchors.get(heading, ''), index] for index, level, heading, start, end in sections[lang].get(kanji, [])]
+
+        props = prop.split('|')
+        remote_prop = '|'.join([x for x in props if x != 'wikitext'])
+
+        def fetch_section(kanji, item):
+            index, lang = item
+            texts = {}
+            if 'wikitext' in props:
+                texts['wikitext'] = section_text(pages[lang][kanji], sections[lang][kanji], index)
+            if remote_prop:
+                fetched = self._fetch_pronunciation(kanji, item, remote_prop)
+                texts.update(fetched if isinstance(fetched, dict) else {remote_prop: fetched})
+            return texts if len(props) > 1 else texts[prop]
+
+        result = {}
+        for kanji in kanji_list:
+            indices_list = select_ja_sections(kanji, sections_map(kanji, 'ja'))
+            indices_list.extend(select_zh_sections(kanji, sections_map(kanji, 'zh')))
+            result[kanji] = self._collect_props(kanji, indices_list, lambda item: fetch_section(kanji, item), prop)
+            if revisions is not None:
+                revisions[kanji] = {lang: revids[lang].get(kanji) for lang in ['ja', 'zh']}
+        return result
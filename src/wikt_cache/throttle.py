@@ -0,0 +1,125 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+class RateLimiter:
+    """
+    A thread-safe per-host rate limiter.
+
+    Every host gets its own schedule, so ja.wiktionary.org and zh.wiktionary.org are throttled
+    independently. Callers block in `wait()` until the next request slot of the host is reached.
+
+    Attributes:
+        rate (float): Maximum requests per second for each host. None or 0 disables the limit.
+    """
+    def __init__(self, rate=None):
+        self.rate = rate
+        self._interval = 1.0 / rate if rate else 0.0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+
+    def wait(self, host):
+        if not self._interval:
+            return
+        # reserve the next slot of this host while holding the lock, sleep outside of it
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self._interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def run_concurrently(func, items, workers=1):
+    """
+    Apply func to each item with a bounded thread pool, yielding (item, result) pairs as they complete.
+
+    With workers <= 1 the items are processed serially in the given order, which keeps the
+    old behaviour and makes debugging easier.
+    """
+    if workers <= 1:
+        for item in items:
+            yield item, func(item)
+        return
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {executor.submit(func, item): item for item in items}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        # don't wait for the queued items if the consumer stops early, e.g. by Ctrl-C
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class CircuitBreaker:
+    """
+    A thread-safe circuit breaker which pauses all the requests while the upstream looks unhealthy.
+
+    After `threshold` consecutive failed requests the breaker opens, every thread blocks in `wait()` for
+    `cooldown` seconds, then the requests are let through again. If the next request fails as well, the
+    breaker opens again at once, a succeeded one closes it. `hold()` pauses all the threads for a given
+    time, e.g. the Retry-After of a throttled response.
+    """
+    def __init__(self, threshold=10, cooldown=60.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+
+    def wait(self):
+        while True:
+            with self._lock:
+                delay = self._resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+
+    def hold(self, seconds):
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures < self.threshold:
+                return
+            # half open, one more failure opens it again
+            self._failures = self.threshold - 1
+            resume_at = time.monotonic() + self.cooldown
+            if resume_at <= self._resume_at:
+                return
+            self._resume_at = resume_at
+        print(f'the upstream looks unhealthy, pause all the requests for {self.cooldown} seconds.')
+
+
+class Progress:
+    """
+    Print the progress of a long fetching every `interval` items, with the speed and the estimated time left.
+    """
+    def __init__(self, total, interval=10):
+        self.total = total
+        self.interval = interval
+        self.count = 0
+        self._start = time.monotonic()
+
+
+    def update(self):
+        self.count += 1
+        if self.count % self.interval and self.count != self.total:
+            return
+        elapsed = time.monotonic() - self._start
+        speed = self.count / elapsed if elapsed else 0.0
+        eta = (self.total - self.count) / speed if speed else 0.0
+        print(f'{self.count}/{self.total} fetched, {speed:.1f} kanji/s, ETA {int(eta // 3600)}:{int(eta % 3600 // 60):02d}:{int(eta % 60):02d}.')
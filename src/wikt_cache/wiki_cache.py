@@ -1,7 +1,10 @@
 import json
 import shutil
 import os
-from wikt_cache.remote_agent import Agent
+from wikt_cache.remote_agent import Agent, FetchError
+from wikt_cache.throttle import run_concurrently, Progress
+from wikt_cache.planner import plan_batches, fan_out
+from wikt_cache.cache_store import CacheStore, encode_line, decode_line, is_failed, FAILED_MARKER
 
 class WikiCache:
     """
@@ -9,23 +12,48 @@ class WikiCache:
 
     Attributes:
         cache_path (str): Path to the text file used for caching the wiktionary data.
+        use_store (bool): Whether the indexed CacheStore (cache.idx + cache.dat) is used instead of cache.txt.
+                          It's used when the store exists, or when there is no cache.txt to keep using.
+        codec (str): Compression codec of the store, 'none', 'zlib' or 'zstd'. None keeps the current one.
         wiki_dict (dict): Dictionary to store kanji and their associated data from Wiktionary.
+                          A CacheStore which reads the values lazily when use_store is True.
         agent (Agent): An instance of Agent class for fetching data from Wiktionary API.
+        revisions (dict): The revision ids of the cached pages, kanji as key, {'ja': revid, 'zh': revid} as value.
+                          It's kept in revisions.json next to the cache, and used to revalidate the cache.
 
     Methods:
         __init__: Constructor to initialize the WikiCache instance and load existing cached data.
         _create_agent: Initializes and returns an Agent if not already done.
         _load: Loads the cache from a file specified by `cache_path` into `wiki_dict`.
         _save: Saves the current data from `wiki_dict` to a file specified by `cache_path`.
+        compact: Saves `wiki_dict` which includes the journaled entries, then removes the journal.
         update: Refreshes the cached data for the existing kanji entries in `wiki
+        find_changed: Asks the API for the current revision ids in bulk, returns the kanji whose pages changed.
+        failed_keys: Returns the kanji marked as failed by the last fetching, which should be fetched again.
         fetch: Fetches the data for a list of kanji characters using the Agent and updates the cache.
+               With workers > 1 the kanji are fetched concurrently through one shared, rate limited Agent.
+               With batch_size > 1 the kanji are grouped into batches which are fetched by Agent.fetch_batch.
+               With checkpoint each fetched entry is appended to a journal file at once. If the fetching
+               is interrupted, the next fetch skips the journaled kanji and resumes from where it stopped.
+               With html_writer the rendered html is fetched in the same pass and passed to it.
     """
-    def __init__(self, cache_dir):
+    def __init__(self, cache_dir, api_url=None, rate_limit=None, codec=None):
+        self.cache_dir = cache_dir
         self.cache_path = os.path.join(cache_dir, 'cache.txt')
+        self.journal_path = self.cache_path + '.journal'
         self.patch_path = os.path.join(cache_dir, 'patch.txt')
+        self.revisions_path = os.path.join(cache_dir, 'revisions.json')
+        self.anchors_path = os.path.join(cache_dir, 'anchors.json')
+        self.api_url = api_url
+        self.rate_limit = rate_limit
+        self.codec = codec
         self.agent = None
         self.patch = self._load_patch()
+        self.journal_keys = set()
+        self.use_store = CacheStore.exists(cache_dir) or not os.path.isfile(self.cache_path)
         self.wiki_dict = self._load_cache()
+        self.revisions = self._load_revisions()
+        self.anchors = self._load_anchors()
 
 
     def _load_patch(self):
@@ -36,13 +64,60 @@ class WikiCache:
         return patch
 
 
-    def _load_cache(self):
-        if not os.path.isfile(self.cache_path):
+    def _load_revisions(self):
+        if not os.path.isfile(self.revisions_path):
             return {}
-        wiki_dict = {}
-        with open(self.cache_path, 'r') as file:
+        with open(self.revisions_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+
+    def _save_revisions(self):
+        tmp_path = self.revisions_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.revisions, file, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp_path, self.revisions_path)
+
+
+    def _load_anchors(self):
+        # the anchors of the headings expanded by `action=expandtemplates`, see Agent.resolve_anchors()
+        if not os.path.isfile(self.anchors_path):
+            return {'ja': {}, 'zh': {}}
+        with open(self.anchors_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+
+    def _save_anchors(self):
+        tmp_path = self.anchors_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.anchors, file, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp_path, self.anchors_path)
+
+
+    def _read_lines(self, path):
+        with open(path, 'r') as file:
             for line in file:
-                key, *values = line.strip().replace('\\n', '\n').replace('\\r', '\r').split('\t')
+                # a journal line may be cut off by a crash, it has no line end
+                if not line.endswith('\n'):
+                    break
+                yield decode_line(line)
+
+
+    def _load_cache(self):
+        if self.codec and not self.use_store:
+            print(f'the codec {self.codec} is ignored by {self.cache_path}, convert it to the indexed cache store first.')
+        wiki_dict = CacheStore(self.cache_dir, exclude=self.patch, codec=self.codec) if self.use_store else {}
+        if not self.use_store and os.path.isfile(self.cache_path):
+            for key, values in self._read_lines(self.cache_path):
+                if key in self.patch:
+                    continue
+                wiki_dict[key] = values
+
+        # replay the entries fetched by an unfinished fetching, they are newer than cache.txt
+        if os.path.isfile(self.journal_path):
+            for key, values in self._read_lines(self.journal_path):
+                # a failed kanji is tried again when the fetching is resumed
+                if not is_failed(values):
+                    self.journal_keys.add(key)
                 if key in self.patch:
                     continue
                 wiki_dict[key] = values
@@ -50,50 +125,199 @@ class WikiCache:
 
 
     def _save(self):
-        shutil.copy(self.cache_path, self.cache_path + '.bak')
+        self._save_revisions()
+        self._save_anchors()
+        if self.use_store:
+            # only the changed entries are appended, then the small index is rewritten
+            self.wiki_dict.flush()
+            # drop the old records of the rewritten kanji once they take more space than the live ones,
+            # or recompress all the records when the codec is changed
+            if self.wiki_dict.needs_compact():
+                self.wiki_dict.compact()
+            print('saved to cache store')
+            return
+        if os.path.isfile(self.cache_path):
+            shutil.copy(self.cache_path, self.cache_path + '.bak')
         with open(self.cache_path, 'w') as file:
             for k, v in self.wiki_dict.items():
-                v = [x.replace('\t', '') for x in v]
-                s = '\t'.join([k] + v) + '\n'
-                s = s.replace('\n', '\\n').replace('\r', '\\r')
-                file.write(s+'\n')
+                file.write(encode_line(k, v))
         print('saved to cache')
 
 
+    def compact(self):
+        self._save()
+        if os.path.isfile(self.journal_path):
+            os.remove(self.journal_path)
+        self.journal_keys = set()
+
+
     def update(self):
         self.fetch(list(self.wiki_dict.keys()))
 
 
-    def _create_agent(self):
+    def _create_agent(self, pool_size=1):
         if not self.agent:
-            self.agent = Agent()
+            self.agent = Agent(self.api_url, self.rate_limit, pool_size, self.anchors)
         return self.agent
 
 
-    def fetch(self, kanji_list):
-        agent = self._create_agent()
-        for count, kanji in enumerate(kanji_list):
-            ja_text, zh_text1, zh_text2 = agent.fetch(kanji)
-            self.wiki_dict[kanji] = [ja_text, zh_text1, zh_text2]
-            if count % 10 == 0:
-                print(f'{count} fetched.')
-        self._save()
-        
+    def resolve_anchors(self, headings, lang):
+        """
+        The anchors of the raw headings of a page, the ones using templates are expanded by the API once,
+        then kept in anchors.json, see Agent.resolve_anchors().
+        """
+        return self._create_agent().resolve_anchors(headings, lang)
+
+
+    def find_changed(self, kanji_list, workers=1):
+        """
+        Revalidate the cached kanji with the current revision ids of their pages, which are queried 50 kanji
+        per request without any content.
+
+        Returns:
+            list: The kanji whose ja or zh page has a new revision, or whose revision is not known, e.g. it's
+                  cached before the revisions are recorded, or it's fetched by an interrupted fetching.
+        """
+        agent = self._create_agent(workers)
+        changed = []
+        for batch, current in run_concurrently(agent.fetch_revisions, plan_batches(kanji_list, 50), workers):
+            for kanji in batch:
+                if kanji not in current or self.revisions.get(kanji) != current[kanji]:
+                    changed.append(kanji)
+        return changed
+
+
+    def failed_keys(self):
+        return [kanji for kanji, values in self.wiki_dict.items() if is_failed(values)]
+
+
+    def _fetch_one(self, kanji, prop='wikitext'):
+        revisions = {}
+        try:
+            return self.agent.fetch(kanji, prop, revisions), revisions
+        except FetchError as e:
+            print(kanji, 'fetch failed:', e)
+            return None, {}
+
+
+    def _fetch_batch(self, kanji_list, prop='wikitext'):
+        revisions = {}
+        try:
+            result = self.agent.fetch_batch(kanji_list, prop, revisions)
+        except FetchError as e:
+            print(kanji_list, 'fetch failed:', e)
+            return {kanji: (None, {}) for kanji in kanji_list}
+        return {kanji: (texts, revisions.get(kanji, {})) for kanji, texts in result.items()}
+
+
+    def fetch(self, kanji_list, workers=1, batch_size=1, checkpoint=False, sync_interval=10, html_writer=None):
+        # the kanji fixed by patch.txt are never read from the cache, don't fetch them
+        kanji_list = [kanji for kanji in kanji_list if kanji not in self.patch]
+        if not checkpoint:
+            # _fetch() is a generator, it only fetches while being consumed
+            for _ in self._fetch(kanji_list, workers, batch_size, html_writer):
+                pass
+            self._save()
+            return
+
+        # the journaled kanji have been fetched by the interrupted fetching, resume from the others
+        resumed_list = [kanji for kanji in kanji_list if kanji not in self.journal_keys]
+        if len(resumed_list) < len(kanji_list):
+            print(f'resume fetching, {len(kanji_list) - len(resumed_list)} kanji were fetched before.')
+
+        with open(self.journal_path, 'a') as journal:
+            try:
+                for count, (kanji, values) in enumerate(self._fetch(resumed_list, workers, batch_size, html_writer), start=1):
+                    journal.write(encode_line(kanji, values))
+                    journal.flush()
+                    self.journal_keys.add(kanji)
+                    # fsync is expensive, only make the journal durable every sync_interval entries
+                    if count % sync_interval == 0:
+                        os.fsync(journal.fileno())
+            except KeyboardInterrupt:
+                print(f'interrupted, {len(self.journal_keys)} fetched kanji are kept in {self.journal_path}, run it again to resume.')
+                raise
+            finally:
+                journal.flush()
+                os.fsync(journal.fileno())
+
+        # merge the journal into cache.txt only once, at the end
+        self.compact()
+
+
+    def _fetch(self, kanji_list, workers=1, batch_size=1, html_writer=None):
+        """
+        Fetch kanji_list into wiki_dict, yielding each kanji and its values as soon as it's fetched.
+
+        If html_writer is given, the rendered html is fetched together with the wikitext, by the same
+        requests for the sections, and html_writer(kanji, [ja_html, zh_html1, zh_html2]) is called with it.
+        """
+        self._create_agent(workers)
+        prop = 'wikitext|text' if html_writer else 'wikitext'
+        # only the main thread writes wiki_dict, the worker threads just talk to the remote
+        if batch_size > 1:
+            results = fan_out(run_concurrently(lambda batch: self._fetch_batch(batch, prop), plan_batches(kanji_list, batch_size), workers))
+        else:
+            results = run_concurrently(lambda kanji: self._fetch_one(kanji, prop), kanji_list, workers)
+        failed_count = 0
+        progress = Progress(len(set(kanji_list)))
+        for kanji, (texts, revisions) in results:
+            if texts is None:
+                # keep the last good values, but mark them, so the kanji is queued again by the next fetching
+                failed_count += 1
+                texts = self.wiki_dict[kanji][:3] if kanji in self.wiki_dict else ['', '', '']
+                texts = texts + [FAILED_MARKER]
+                self.wiki_dict[kanji] = texts
+                self.revisions.pop(kanji, None)
+            else:
+                if html_writer:
+                    html_writer(kanji, texts['text'])
+                    texts = texts['wikitext']
+                ja_text, zh_text1, zh_text2 = texts
+                texts = [ja_text, zh_text1, zh_text2]
+                self.wiki_dict[kanji] = texts
+                self.revisions[kanji] = {lang: revisions.get(lang) for lang in ['ja', 'zh']}
+            progress.update()
+            yield kanji, texts
+        if failed_count:
+            print(f'{failed_count} kanji failed to fetch, they are marked in the cache and will be fetched again next time.')
+
+
 
     def cache_info(self):
-        if not os.path.isfile(self.cache_path):
+        if self.use_store:
+            return self._store_info()
+        if not os.path.isfile(self.cache_path) and not self.journal_keys:
             return None
 
         kanji_list = []
-        with open(self.cache_path, 'r') as file:
-            for line in file:
-                kanji = line.split('\t')[0]
-                kanji_list.append(kanji)
-                
-        file_info = os.stat(self.cache_path)
+        if os.path.isfile(self.cache_path):
+            with open(self.cache_path, 'r') as file:
+                for line in file:
+                    kanji = line.split('\t')[0]
+                    if kanji not in self.patch:
+                        kanji_list.append(kanji)
+        # the journaled kanji are cached as well, they will be merged into cache.txt later
+        kanji_list.extend(self.journal_keys - set(kanji_list) - set(self.patch))
+
+        file_info = os.stat(self.cache_path) if os.path.isfile(self.cache_path) else None
+        return {
+            'kanji_count': len(kanji_list),
+            'kanji_list': kanji_list,
+            'file_size': file_info.st_size if file_info else 0,
+            'update_time': file_info.st_mtime if file_info else None
+        }
+
+
+    def _store_info(self):
+        # listing the kanji only reads the index, the journaled kanji are already in the store
+        kanji_list = [kanji for kanji in self.wiki_dict.all_keys() if kanji not in self.patch]
+        if not kanji_list:
+            return None
+        index_path = self.wiki_dict.index_path
         return {
             'kanji_count': len(kanji_list),
             'kanji_list': kanji_list,
-            'file_size': file_info.st_size,
-            'update_time': file_info.st_mtime
+            'file_size': self.wiki_dict.data_size(),
+            'update_time': os.stat(index_path).st_mtime if os.path.isfile(index_path) else None
         }
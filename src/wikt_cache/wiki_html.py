@@ -1,6 +1,9 @@
 import os
 import json
-from wikt_cache.remote_agent import Agent
+import gzip
+import traceback
+from wikt_cache.remote_agent import Agent, FetchError
+from wikt_cache.throttle import run_concurrently, Progress
 from wikt_cache.wiki_cache import WikiCache
 from file_util import prepare_file_path
 
@@ -12,11 +15,12 @@ def _get_kanji_list(cache_dir):
 
 
 def _filter_out_existing_files(html_path, kanji_list):
-    existing_files = [f.split('.')[0] for f in os.listdir(html_path)]
+    # a .tmp file is left by an interrupted writing, the kanji is still missing
+    existing_files = [f.split('.')[0] for f in os.listdir(html_path) if not f.endswith('.tmp')]
     return list(set(kanji_list) - set(existing_files))
  
 
-def _save_html(html_path, kanji, html_list):
+def save_html(html_path, kanji, html_list, compress=False):
     ja_html, zh_html1, zh_html2 = html_list
     html_dict = {
         "ja": ja_html,
@@ -24,20 +28,49 @@ def _save_html(html_path, kanji, html_list):
         "zh2": zh_html2,
     }
     file_path = os.path.join(html_path, f'{kanji}.json')
-    with open(file_path, 'w') as file:
+    # only one of {kanji}.json and {kanji}.json.gz is kept
+    old_file_path = file_path
+    if compress:
+        file_path += '.gz'
+    else:
+        old_file_path += '.gz'
+    # write to a temp file then rename it, an interrupted fetching never leaves a truncated file behind
+    tmp_path = file_path + '.tmp'
+    with (gzip.open(tmp_path, 'wt', encoding='utf-8') if compress else open(tmp_path, 'w')) as file:
         json.dump(html_dict, file, ensure_ascii=False)
+    os.replace(tmp_path, file_path)
+    if os.path.isfile(old_file_path):
+        os.remove(old_file_path)
 
 
-def fetch(kanji_list, html_path):
-    agent = Agent()
-    for count, kanji in enumerate(kanji_list):
-        ja_text, zh_text1, zh_text2 = agent.fetch(kanji, prop='text')
-        _save_html(html_path, kanji, [ja_text, zh_text1, zh_text2])
-        if count % 10 == 0:
-            print(f'{count} fetched.')
+def _fetch_html(agent, kanji):
+    try:
+        return agent.fetch(kanji, prop='text')
+    except FetchError:
+        traceback.print_exc()
+        return None
 
 
-def fetch_wiki_html(cache_path, update_flag=True, fetch_missing_only=True):
+def fetch(kanji_list, html_path, compress=False, workers=1, rate_limit=None, api_url=None):
+    """
+    Fetch the rendered html of kanji_list by `workers` threads sharing one rate limited Agent. Each file is
+    written by the main thread as soon as its kanji is fetched. A kanji failed to fetch is not written, so
+    it's fetched again as a missing one next time.
+    """
+    agent = Agent(api_url, rate_limit, workers)
+    progress = Progress(len(kanji_list))
+    failed_count = 0
+    for kanji, html_list in run_concurrently(lambda kanji: _fetch_html(agent, kanji), kanji_list, workers):
+        if html_list is None:
+            failed_count += 1
+        else:
+            save_html(html_path, kanji, html_list, compress)
+        progress.update()
+    if failed_count:
+        print(f'{failed_count} kanji failed to fetch, run it again to fetch them.')
+
+
+def fetch_wiki_html(cache_path, update_flag=True, fetch_missing_only=True, compress=False, workers=1, rate_limit=None, api_url=None):
     html_path = os.path.join(cache_path, 'html')
     prepare_file_path(html_path, is_dir=True, create_if_not_exists=True, delete_if_exists=False)
 
@@ -47,4 +80,4 @@ def fetch_wiki_html(cache_path, update_flag=True, fetch_missing_only=True):
         kanji_list = _filter_out_existing_files(html_path, kanji_list)
     print(f'fetching {len(kanji_list)} kanji.')
     
-    fetch(sorted(kanji_list), html_path)
+    fetch(sorted(kanji_list), html_path, compress, workers, rate_limit, api_url)
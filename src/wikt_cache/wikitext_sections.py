@@ -0,0 +1,174 @@
+import re
+
+_heading_pattern = re.compile(r'^(={1,6})(.+?)(={1,6})\s*$')
+
+# the anchors of the pronunciation sections, shared by the API fetching and the dump import
+JA_SECTION_KEYWORDS = ['日本語', '中国語']   # ja.wiktionary.org
+ZH_SECTION_PARENT_KEYWORDS = ['汉语', '漢語', '汉语族', '漢語族', '汉字', '漢字']   # zh.wiktionary.org
+ZH_SECTION_CHILD_KEYWORDS = ["發音", "发音", "讀音", '讀法', '读法', "读音", "拼音"]
+
+
+def _strip_comments(lines):
+    """
+    Yield each line with its HTML comments removed, comments may span several lines.
+    """
+    in_comment = False
+    for line in lines:
+        if in_comment:
+            if '-->' not in line:
+                yield ''
+                continue
+            line = line.split('-->', 1)[1]
+            in_comment = False
+        line = re.sub(r'<!--.*?-->', '', line)
+        if '<!--' in line:
+            line = line.split('<!--', 1)[0]
+            in_comment = True
+        yield line
+
+
+def split_sections(wikitext):
+    """
+    Locate the sections of a wikitext in the same way MediaWiki numbers them, so the index of a section
+    is the value accepted by the `section` parameter of `action=parse`.
+
+    Args:
+        wikitext (str): The whole wikitext of a page.
+
+    Returns:
+        list: A list of [index, level, heading, start_line, end_line]. Lines in [start_line, end_line) are
+              the text of the section, including its heading line and all of its sub-sections.
+
+    Example:
+        Input:
+            '=={{ja}}==\\n==={{pron|jpn}}===\\n* 音読み\\n==={{prov}}===\\n* [[刑戮]]'
+        Output:
+            [
+                [1, 2, '{{ja}}', 0, 5],
+                [2, 3, '{{pron|jpn}}', 1, 3],
+                [3, 3, '{{prov}}', 3, 5]
+            ]
+    """
+    lines = wikitext.split('\n')
+    sections = []
+    for line_number, line in enumerate(_strip_comments(lines)):
+        matched = _heading_pattern.match(line)
+        if not matched:
+            continue
+        left, heading, right = matched.groups()
+        level = min(len(left), len(right))
+        # unbalanced equal signs are part of the heading text
+        heading = '=' * (len(left) - level) + heading + '=' * (len(right) - level)
+        sections.append([len(sections) + 1, level, heading.strip(), line_number, len(lines)])
+
+    # a section ends where the next heading of the same or a higher level starts
+    for position, section in enumerate(sections):
+        for next_section in sections[position+1:]:
+            if next_section[1] <= section[1]:
+                section[4] = next_section[3]
+                break
+
+    return sections
+
+
+def section_text(wikitext, sections, index):
+    """
+    Return the wikitext of the section numbered `index`, the result of split_sections(wikitext) is passed in
+    as `sections` so a page is only split once.
+    """
+    for section_index, level, heading, start_line, end_line in sections:
+        if section_index == index:
+            return '\n'.join(wikitext.split('\n')[start_line:end_line]).rstrip()
+    return ''
+
+
+def heading_anchor(heading):
+    """
+    Convert a rendered heading to the anchor used by the `sections` prop of `action=parse`,
+    e.g. '[[日本語]]' -> '日本語', '発音 1' -> '発音_1'.
+    """
+    text = re.sub(r'<!--.*?-->', '', heading)
+    text = re.sub(r'\[\[(?:[^\]|]*\|)?([^\]|]*)\]\]', r'\1', text)
+    text = re.sub(r'<[^>]*>', '', text)
+    text = text.replace("'''", '').replace("''", '')
+    return '_'.join(text.split())
+
+
+def select_ja_sections(kanji, sections_map):
+    """
+    Select the sections of a ja page by JA_SECTION_KEYWORDS.
+
+    Args:
+        sections_map (list): [anchor, index] of each section of the page.
+
+    Returns:
+        list: [index, 'ja'] of the section of each keyword, None for a keyword not found.
+    """
+    keywords_indices = []
+    for keyword in JA_SECTION_KEYWORDS:
+        keyword_index= None
+        for anchor, index in sections_map:
+            if keyword == anchor:
+                keyword_index = index
+                break
+        if keyword_index:
+            keywords_indices.append([keyword_index, 'ja'])
+        else:
+            keywords_indices.append(None)
+
+    if not keywords_indices:
+        print(kanji, 'no ja sections found', sections_map)
+    return keywords_indices
+
+
+def select_zh_sections(kanji, sections_map):
+    """
+    Select the pronunciation sections of a zh page, the child sections of the first parent keyword found.
+
+    Args:
+        sections_map (list): [anchor, index] of each section of the page.
+
+    Returns:
+        list: [index, 'zh'] of each selected section.
+    """
+    keyword_indices = []
+    for parent_keyword in ZH_SECTION_PARENT_KEYWORDS:
+        keyword_index_list = []
+        found_parent = False
+        for anchor, index in sections_map:
+            # find parent keyword
+            if parent_keyword == anchor:
+                found_parent = True
+                continue
+            if not found_parent:
+                continue
+
+            # when another parent keyword is found, break the loop, enter the next parent keyword loop
+            if anchor in ZH_SECTION_PARENT_KEYWORDS:
+                found_parent = False
+                break
+
+            # find child keyword after the parent keyword and before the next parent keyword
+            for child_keyword in ZH_SECTION_CHILD_KEYWORDS:
+                if anchor.startswith(child_keyword):
+                    keyword_index_list.append(index)
+                    break
+
+        keyword_indices.append(keyword_index_list if keyword_index_list else None)
+
+    # if none keyword is found, try to find a keyword without parent
+    if all([i == None for i in keyword_indices]):
+        for anchor, index in sections_map:
+            if anchor in ZH_SECTION_CHILD_KEYWORDS:
+                keyword_indices = [[index]]
+                break
+
+    result = []
+    for index_list in keyword_indices:
+        if index_list:
+            result = [[index, 'zh'] for index in index_list]
+            break
+    if not result:
+        print(kanji, 'no zh sections found', sections_map)
+
+    return result
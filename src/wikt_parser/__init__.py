@@ -1,22 +1,34 @@
 
 from wikt_cache.wiki_cache import WikiCache
-from wikt_parser.wiktext_spliter import split_groups
-from wikt_parser.ja_parser import create_ja_pron_arch
-from wikt_parser.ja_onyomi_parser import parse_onyomi
+from wikt_parser.incremental import parse_onyomi_incrementally
 from wikt_parser.wikt_bugfix import fix_by_wikt_patch, merge_with_preparation
+from wikt_parser.result_cache import ParsedResultCache
 
 
-def parse_ja_yomi(wiki_cache_dir):
-    wiki_cache = WikiCache(wiki_cache_dir)
+def parse_ja_yomi(wiki_cache_dir, use_cache=True, jobs=1):
+    """
+    Parse the wiktionary cache and merge it with the preparation data. The result is cached in the wiki cache
+    dir, and reused until the wiktionary cache, the patch, the preparation data or the parsing code changes.
+    When it changes, only the kanji whose wikitext or special case has changed are parsed again.
+    use_cache=False parses all the kanji. The kanji are parsed with `jobs` processes, 0 means one for each cpu.
+    """
+    result_cache = ParsedResultCache(wiki_cache_dir)
+    if use_cache:
+        result = result_cache.load()
+        if result is not None:
+            return result
 
-    # common operation for all languages, both ja and zh
-    kanji_dict = split_groups(wiki_cache.wiki_dict)
+    result = _parse_ja_yomi(wiki_cache_dir, use_cache, jobs)
+    result_cache.save(result)
+    return result
 
-    # common operation for ja, both onyomi and kunyomi
-    pron_arch_dict = create_ja_pron_arch(kanji_dict)
-    
-    # parse onyomi and kunyomi
-    wikt_onyomi_dict, wikt_all_onyomi_keys = parse_onyomi(pron_arch_dict)
+
+def _parse_ja_yomi(wiki_cache_dir, use_cache=True, jobs=1):
+    wiki_cache = WikiCache(wiki_cache_dir)
+
+    # split groups, create the ja pronunciation architecture and parse onyomi of each kanji,
+    # the unchanged kanji are taken from the last run
+    wikt_onyomi_dict, wikt_all_onyomi_keys = parse_onyomi_incrementally(wiki_cache.wiki_dict, wiki_cache_dir, use_cache, jobs)
     
     # fix wikt data by patch
     fix_by_wikt_patch(wikt_onyomi_dict)
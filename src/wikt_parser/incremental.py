@@ -0,0 +1,162 @@
+import os
+import ast
+import pickle
+import hashlib
+import inspect
+from concurrent.futures import ProcessPoolExecutor
+from wikt_parser import wiktext_spliter, utils, ja_filter, ja_parser, ja_onyomi_parser
+from wikt_parser.wiktext_spliter import split_groups_for_each_kanji
+from wikt_parser.ja_filter import select_ja_pronucation, PRONUNCIATION_KEYWORDS
+from wikt_parser.ja_parser import parse_pron_arch
+from wikt_parser.ja_onyomi_parser import onyomi_special_cases, parse_onyomi_for_single_kanji, merge_onyomi_of_kanji
+
+# bump it when the structure of the saved state changes
+KANJI_CACHE_VERSION = 1
+KANJI_CACHE_FILE = 'parsed_kanji.pickle'
+
+
+def _code_digest():
+    """
+    Digest of the source files of the modules which parse a single kanji, so the module level data they
+    use, e.g. the tables of ja_onyomi_parser and PRONUNCIATION_KEYWORDS, is covered as well.
+
+    The onyomi_special_cases assignment is left out, it's part of the fingerprint of each kanji, so a
+    changed special case only affects its kanji.
+    """
+    hasher = hashlib.sha256()
+    for module in [wiktext_spliter, utils, ja_filter, ja_parser, ja_onyomi_parser]:
+        source = inspect.getsource(module)
+        lines = source.splitlines(keepends=True)
+        for node in ast.parse(source).body:
+            if isinstance(node, ast.Assign) and any(isinstance(target, ast.Name) and target.id == 'onyomi_special_cases' for target in node.targets):
+                lines[node.lineno - 1:node.end_lineno] = [''] * (node.end_lineno - node.lineno + 1)
+        hasher.update(module.__name__.encode('utf-8'))
+        hasher.update(b'\0')
+        hasher.update(''.join(lines).encode('utf-8'))
+    return hasher.hexdigest()
+
+
+def kanji_fingerprint(kanji, details_texts):
+    """
+    Fingerprint of all the inputs of parse_single_kanji(), the ja wikitext and the special case of the kanji.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(details_texts[0].encode('utf-8'))
+    hasher.update(b'\0')
+    hasher.update(repr(onyomi_special_cases.get(kanji)).encode('utf-8'))
+    return hasher.digest()
+
+
+def parse_single_kanji(kanji, details_texts):
+    """
+    The same as split_groups(), create_ja_pron_arch() and parse_onyomi() for a single kanji. Only the
+    sections select_ja_pronucation() looks into are split.
+    """
+    details = split_groups_for_each_kanji(kanji, details_texts[0], PRONUNCIATION_KEYWORDS)
+    pron_arch = parse_pron_arch(select_ja_pronucation(details))
+    return parse_onyomi_for_single_kanji(kanji, pron_arch)
+
+
+def _parse_item(item):
+    kanji, details_texts = item
+    return parse_single_kanji(kanji, details_texts)
+
+
+def parse_kanji_list(items, jobs=1):
+    """
+    Parse each (kanji, details_texts) of items, with `jobs` processes. 0 means one process for each cpu.
+
+    The items are sent to the processes in chunks, and the results are returned in the order of items,
+    so the result doesn't depend on the number of processes.
+
+    Returns:
+        list: The result of parse_single_kanji() for each item.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    if jobs <= 1 or len(items) < 2:
+        return [_parse_item(item) for item in items]
+
+    # only the ja wikitext is needed, don't send the zh text to the processes
+    items = [(kanji, details_texts[:1]) for kanji, details_texts in items]
+    # a few chunks for each process, so a process done early takes the left work
+    chunksize = max(1, len(items) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(_parse_item, items, chunksize=chunksize))
+
+
+class KanjiParseCache:
+    """
+    The onyomi parsed from each kanji, saved with the fingerprint of its inputs as a pickle file in the
+    wiki cache dir, so only the kanji whose wikitext or special case has changed are parsed again.
+
+    The whole state is dropped when the parsing code changes.
+    """
+    def __init__(self, wiki_cache_dir):
+        self.cache_path = os.path.join(wiki_cache_dir, KANJI_CACHE_FILE)
+        self.code_digest = _code_digest()
+
+
+    def load(self):
+        """
+        Returns:
+            dict: {kanji: (fingerprint, onyomi)}, empty if there is no usable state.
+        """
+        if not os.path.isfile(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'rb') as file:
+                cached = pickle.load(file)
+        except Exception:
+            print(f'{self.cache_path} is broken, parse all kanji again.')
+            return {}
+        if cached.get('version') != KANJI_CACHE_VERSION or cached.get('code') != self.code_digest:
+            return {}
+        return cached['kanji']
+
+
+    def save(self, parsed):
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'wb') as file:
+            pickle.dump({
+                'version': KANJI_CACHE_VERSION,
+                'code': self.code_digest,
+                'kanji': parsed
+            }, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.cache_path)
+
+
+def parse_onyomi_incrementally(wiki_dict, wiki_cache_dir, use_cache=True, jobs=1):
+    """
+    The same result as parse_onyomi(create_ja_pron_arch(split_groups(wiki_dict))), but the kanji whose
+    fingerprint is unchanged since the last run are taken from KanjiParseCache instead of being parsed again.
+
+    The returned values are fresh copies loaded from the cache or just parsed, the state is saved before
+    returning, so the later steps are free to modify them. The changed kanji are parsed with `jobs` processes,
+    see parse_kanji_list().
+
+    Returns:
+        tuple: (onyomi_dict, all_onyomi_keys), the same as parse_onyomi().
+    """
+    kanji_cache = KanjiParseCache(wiki_cache_dir)
+    cached = kanji_cache.load() if use_cache else {}
+
+    parsed, changed = {}, []
+    for kanji, details_texts in wiki_dict.items():
+        fingerprint = kanji_fingerprint(kanji, details_texts)
+        if kanji in cached and cached[kanji][0] == fingerprint:
+            parsed[kanji] = cached[kanji]
+        else:
+            # keep the place of the kanji, so the order of the result is the same as wiki_dict
+            parsed[kanji] = (fingerprint, None)
+            changed.append((kanji, details_texts))
+
+    for (kanji, details_texts), onyomi in zip(changed, parse_kanji_list(changed, jobs)):
+        parsed[kanji] = (parsed[kanji][0], onyomi)
+
+    reparsed_count = len(changed)
+    if reparsed_count or len(parsed) != len(cached):
+        kanji_cache.save(parsed)
+    if cached:
+        print(f'{reparsed_count} of {len(parsed)} kanji are parsed again.')
+
+    return merge_onyomi_of_kanji(onyomi for fingerprint, onyomi in parsed.values())
@@ -29,6 +29,10 @@ def fileter_characters(input):
     return ''.join(output) 
 
 
+# select_ja_pronucation() only looks into the headers containing any of them
+PRONUNCIATION_KEYWORDS = ['pron', '読み', '発音']
+
+
 def select_ja_pronucation(wikitionary):
     """
     Extracts Japanese pronunciation information from a structured wikitionary entry.
@@ -254,34 +254,55 @@ def deal_special_cases(kanji, element):
     return element  
 
 
-def text_replacement(text):
-    # remove [], replace full-width char to half-width, change others sign to space
-    text = re.sub(r'[\[\]]', '', text[0])
-    text = text.replace('（', '(').replace('）', ')').replace('：', ':')
-    text = re.sub(r'、|・|　+|,|\'|\u3000', ' ', text)
-    text = re.sub(r'\s+', ' ', text)
-
+# character level replacements of text_replacement(): remove [], replace full-width char to half-width,
+# change others sign to space
+_char_table = str.maketrans({
+    '[': None, ']': None,
+    '（': '(', '）': ')', '：': ':',
+    '、': ' ', '・': ' ', ',': ' ', "'": ' ', '\u3000': ' ',
+})
+
+# the patterns of text_replacement() in the order they are applied, each one with a substring which any
+# match of it contains, the pattern is skipped when the text doesn't contain the substring
+_replacements = [[re.compile(pattern), repl, required] for pattern, repl, required in [
     # remove additional info
-    text = re.sub(r'<ref.*?</ref>', '', text)
-    text = re.sub(r'<ref.*?/>', '', text)
-    text = re.sub(r'Wiktionary:漢字索引\s*音訓\s*[^\|]*\|', '', text)
-    text = re.sub(r':wikipedia:ja:[^\|]*\|', '', text)
-    text = re.sub(r'{{要出典}}', '', text)
+    [r'<ref.*?</ref>', '', '<ref'],
+    [r'<ref.*?/>', '', '<ref'],
+    [r'Wiktionary:漢字索引\s*音訓\s*[^\|]*\|', '', 'Wiktionary:漢字索引'],
+    [r':wikipedia:ja:[^\|]*\|', '', ':wikipedia:ja:'],
+    [r'{{要出典}}', '', '{{要出典}}'],
 
     # remove addtional info of value part which is the substring after ':' of text
-    text = re.sub(r'\(例:[^\)]+\)', '', text)
-    text = re.sub(r'\s+例．.*$', '', text)
-    text = re.sub(r'\(\s*表外:.*\)', '(表外)', text)
-    text = re.sub(r'\(表外[^\)]*\)', '(表外)', text)
-    text = re.sub(r'{{音\|([^}]*)}}', r'\1', text)
-    text = re.sub(r'[\u3041-\u3096]*\|([^\s*])', r'\1', text)
+    [r'\(例:[^\)]+\)', '', '(例:'],
+    [r'\s+例．.*$', '', '例．'],
+    [r'\(\s*表外:.*\)', '(表外)', '表外'],
+    [r'\(表外[^\)]*\)', '(表外)', '(表外'],
+    [r'{{音\|([^}]*)}}', r'\1', '{{音|'],
+    [r'[\u3041-\u3096]*\|([^\s*])', r'\1', '|'],
 
     # uniform value part of text
-    text = re.sub(r'([^\s\(\)]*)\((\s*[^\s\(\)]*)\s+([^\s\(\)]*)\)', r"\1(\2)(\3)", text)
-    text = re.sub(r'([^\s\(\)]*)\(\s*([^\s\(\)]*)\s+([^\s\(\)]*)\s+([^\s\(\)]*)\)', r"\1(\2)(\3)(\4)", text)
+    [r'([^\s\(\)]*)\((\s*[^\s\(\)]*)\s+([^\s\(\)]*)\)', r"\1(\2)(\3)", '('],
+    [r'([^\s\(\)]*)\(\s*([^\s\(\)]*)\s+([^\s\(\)]*)\s+([^\s\(\)]*)\)', r"\1(\2)(\3)(\4)", '('],
 
     # uniform string
-    text = re.sub(r'\(([^:]+):[^\)]+\)', r'(\1)', text)
+    [r'\(([^:]+):[^\)]+\)', r'(\1)', '('],
+]]
+_spaces = re.compile(r'\s+')
+
+
+def text_replacement(text):
+    """
+    Clean a line of onyomi, e.g. ' [[呉音]] : [[ゴウ]]、[[ガフ]]' to ' 呉音 : ゴウ ガフ'.
+
+    It runs for every line of every kanji, so the patterns are compiled once and the character level
+    replacements are done by one str.translate(). Returns '' if there is no value.
+    """
+    text = text[0].translate(_char_table)
+    text = _spaces.sub(' ', text)
+
+    for pattern, repl, required in _replacements:
+        if required in text:
+            text = pattern.sub(repl, text)
 
     # skip if there is no value
     if text.strip() == '無し':
@@ -532,10 +553,17 @@ def parse_onyomi(pron_arch_dict):
     Args:
         pron_arch_dict (dict): A dictionary where keys are kanji characters and values are lists of strings
     """
+    return merge_onyomi_of_kanji(parse_onyomi_for_single_kanji(kanji, pron_arch) for kanji, pron_arch in pron_arch_dict.items())
+
+
+def merge_onyomi_of_kanji(single_onyomi_list):
+    """
+    Merge the results of parse_onyomi_for_single_kanji() of each kanji, in the given order, to the onyomi
+    dictionary and the count of each reading type.
+    """
     onyomi_dict, all_onyomi_keys = {}, {}
 
-    for kanji, pron_arch in pron_arch_dict.items():
-        single = parse_onyomi_for_single_kanji(kanji, pron_arch)
+    for single in single_onyomi_list:
         onyomi_dict.update(single)
         
         for value in single.values():
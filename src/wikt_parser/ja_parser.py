@@ -1,5 +1,4 @@
 
-import copy
 from wikt_parser.utils import parsing_pron_arch_build_tree
 from wikt_parser.ja_filter import select_ja_pronucation
 
@@ -79,11 +78,10 @@ def merge_kunyomi(arch_tree):
         if index+1 < len(arch_tree) and '訓読み' in item[0]:
             kunyomi_merge = True
             break
-    # Perform merging of current '訓読み' with subsequent segments
+    # Perform merging of current '訓読み' with subsequent segments, into a new list so the
+    # input tree is untouched, the other segments are shared
     if kunyomi_merge:
-        tmp = copy.deepcopy(arch_tree[:index+1])
-        tmp[index] += arch_tree[index+1:]
-        arch_tree = tmp
+        arch_tree = arch_tree[:index] + [arch_tree[index] + arch_tree[index+1:]]
 
     return arch_tree
     
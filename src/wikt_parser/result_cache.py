@@ -0,0 +1,92 @@
+import os
+import pickle
+import config
+from file_util import files_signature, files_digest
+from preparation.snapshot import source_paths
+
+# bump it when the structure of the parsed result changes
+RESULT_CACHE_VERSION = 1
+RESULT_CACHE_FILE = 'parsed_yomi.pickle'
+
+
+def _input_paths(wiki_cache_dir):
+    """
+    All the files parse_ja_yomi() depends on: the wiktionary cache in any of its formats, the patch,
+    the preparation data, and the parsing code itself, e.g. onyomi_special_cases in ja_onyomi_parser.py.
+    """
+    paths = [os.path.join(wiki_cache_dir, name) for name in ['cache.txt', 'cache.txt.journal', 'cache.idx', 'cache.dat', 'patch.txt']]
+    # load_patch() reads the patch of the default cache dir
+    paths.append(config.WIKT_PATCH_FILE)
+
+    # only the source files the preparation snapshot is built from, not e.g. the generated output.csv
+    paths.extend(source_paths(config.PREPARATION_DIR))
+
+    code_dirs = [os.path.dirname(os.path.abspath(__file__)), os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'preparation')]
+    for root_dir in code_dirs:
+        for root, dirs, files in os.walk(root_dir):
+            dirs[:] = sorted(d for d in dirs if d != '__pycache__')
+            paths.extend(os.path.join(root, name) for name in sorted(files) if name.endswith('.py'))
+
+    # the same file may be listed twice, e.g. the patch of the default cache dir
+    return list(dict.fromkeys(os.path.normpath(path) for path in paths))
+
+
+class ParsedResultCache:
+    """
+    A persistent cache of the result of parse_ja_yomi(), saved as a pickle file in the wiki cache dir.
+
+    The cache is keyed by the contents of all the input files. The sizes and modification times of the
+    files are checked first, the contents are only hashed when they differ, e.g. a file is touched or
+    changed, so an unchanged cache is loaded without reading the inputs.
+    """
+    def __init__(self, wiki_cache_dir):
+        self.cache_path = os.path.join(wiki_cache_dir, RESULT_CACHE_FILE)
+        self.input_paths = _input_paths(wiki_cache_dir)
+        # taken before parsing, an input changed while parsing makes the saved result outdated at once
+        self._signature = files_signature(self.input_paths)
+        self._digest = None
+
+
+    def _write(self, cached):
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'wb') as file:
+            pickle.dump(cached, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.cache_path)
+
+
+    def load(self):
+        """
+        Returns:
+            The cached result, or None if there is no cache or any input has changed.
+        """
+        cached = None
+        if os.path.isfile(self.cache_path):
+            try:
+                with open(self.cache_path, 'rb') as file:
+                    cached = pickle.load(file)
+            except Exception:
+                print(f'{self.cache_path} is broken, parse again.')
+        if not cached or cached.get('version') != RESULT_CACHE_VERSION:
+            self._digest = files_digest(self.input_paths)
+            return None
+        if cached['signature'] == self._signature:
+            return cached['result']
+
+        self._digest = files_digest(self.input_paths)
+        if cached['digest'] != self._digest:
+            return None
+        # touched but not changed, keep the new signature so the contents are not hashed next time
+        cached['signature'] = self._signature
+        self._write(cached)
+        return cached['result']
+
+
+    def save(self, result):
+        if self._digest is None:
+            self._digest = files_digest(self.input_paths)
+        self._write({
+            'version': RESULT_CACHE_VERSION,
+            'signature': self._signature,
+            'digest': self._digest,
+            'result': result
+        })
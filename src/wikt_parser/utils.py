@@ -2,9 +2,9 @@ def parsing_pron_arch_build_tree(levels, texts):
     """
     Constructs a hierarchical tree representation from provided text and their associated levels.
 
-    This function recursively generates a nested list where the first element of each list is a text header 
-    corresponding to a 'level' of 0, and the following items in the list representing sub-levels and their 
-    corresponding texts. The recursion continues down through levels creating a tree-like structure.
+    This function generates a nested list where the first element of each list is a text header 
+    corresponding to the lowest level, and the following items in the list representing sub-levels and their 
+    corresponding texts. It continues down through levels creating a tree-like structure.
 
     Args:
         levels (list of int): List of integers where each integer represents the hierarchical level of the 
@@ -15,7 +15,7 @@ def parsing_pron_arch_build_tree(levels, texts):
 
     Returns:
         dict: A nested list representing the hierarchical structure of headers and data. Each 'level' 
-              of 1 in 'levels' starts a new list, with the value being the recursive call to handle 
+              of 1 in 'levels' starts a new list, with the value being the subtree built from 
               all subsequent sub-levels and texts.
               
     Example:
@@ -30,46 +30,50 @@ def parsing_pron_arch_build_tree(levels, texts):
                 "text2", "text2.1"
             ]
     """
-    # Check if there are no levels provided (base case for recursion), return an empty dictionary
-    if not levels:
-        return []
-    
-    # Create an empty dictionary where the results of parsing will be stored
+    # The sub lists waiting to be built, each one is the levels and texts of it, its minimum level, which is
+    # the level of its top nodes, and the list its nodes are added to. A stack instead of recursion, and the
+    # minimum is tracked while the sub list is collected, so every text is only visited once on each depth.
     result = []
-    
-    # Decrease each level by one to facilitate sub-level parsing relative to the current level
-    new_levels = levels
-    while min(new_levels):
-        new_levels = [x-1 for x in new_levels]
+    tasks = [(levels, texts, min(levels) if levels else 0, result)]
 
-    # Initialize lists to store sub-levels and sub-texts that will compose subtrees
-    sub_levels = []
-    sub_texts = []
-    
-    # Variable to store the current header text to be used as a key for sub-trees
-    previous_text = None
-    
-    # Iterate through each level and its corresponding text
-    for index, level in enumerate(new_levels):
-        text = texts[index]
-        
-        # If the level is non-zero, it indicates it is a sub-level to the current block
-        if level:
-            sub_levels.append(level)
-            sub_texts.append(text)
+    while tasks:
+        levels, texts, top_level, nodes = tasks.pop()
+        if not levels:
             continue
-        
-        # Encountering a zero level: wrap up/sub-tree the previous block and start a new one
-        if previous_text:
-            result.append([previous_text] + parsing_pron_arch_build_tree(sub_levels, sub_texts))
-            sub_texts = []
-            sub_levels = []
-        
-        # Update previous_text to be the new block's header key
-        previous_text = text
-    
-    # After loop, process last accumulated sublist to ensure all texts are linked to the right headers
-    result.append([previous_text] + parsing_pron_arch_build_tree(sub_levels, sub_texts))
 
-    # Return the constructed tree-like dictionary
-    return result
\ No newline at end of file
+        # Initialize lists to store sub-levels and sub-texts that will compose subtrees
+        sub_levels = []
+        sub_texts = []
+        sub_top_level = None
+
+        # Variable to store the current header text to be used as a key for sub-trees
+        previous_text = None
+
+        for level, text in zip(levels, texts):
+            # If the level is deeper than the top level, it indicates it is a sub-level to the current block
+            if level != top_level:
+                sub_levels.append(level)
+                sub_texts.append(text)
+                if sub_top_level is None or level < sub_top_level:
+                    sub_top_level = level
+                continue
+
+            # Encountering a top level: wrap up/sub-tree the previous block and start a new one
+            if previous_text:
+                node = [previous_text]
+                nodes.append(node)
+                tasks.append((sub_levels, sub_texts, sub_top_level, node))
+                sub_levels = []
+                sub_texts = []
+                sub_top_level = None
+
+            # Update previous_text to be the new block's header key
+            previous_text = text
+
+        # After loop, process last accumulated sublist to ensure all texts are linked to the right headers
+        node = [previous_text]
+        nodes.append(node)
+        tasks.append((sub_levels, sub_texts, sub_top_level, node))
+
+    # Return the constructed tree-like list
+    return result
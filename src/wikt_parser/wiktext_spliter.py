@@ -1,6 +1,9 @@
 import re
 
-def split_groups_for_each_kanji(k, wikitext):
+_html_comment = re.compile(r'\s*<!--[^->]*-->\s*')
+
+
+def split_groups_for_each_kanji(k, wikitext, keywords=None):
     """
     Parses the provided wikitext for a given kanji entry and organizes it into a structured dictionary.
     
@@ -11,6 +14,11 @@ def split_groups_for_each_kanji(k, wikitext):
     Parameters:
         wikitext (str): The string of wikitext that includes textual data possibly containing headers and 
                         structured information.
+        keywords (list): If given, only the headers containing any of the keywords keep their content lines,
+                         the other headers are kept with their level only, e.g. ['pron', '読み', '発音'] for
+                         select_ja_pronucation(). The scanning stops at the first header after the last
+                         occurrence of any keyword in the wikitext, since no header of interest can follow,
+                         so the long sections at the end of a page, e.g. 熟語, are not split at all.
     
     Returns:
         dict: A dictionary where each key is a header title and each value is a list that begins with a 
@@ -75,20 +83,37 @@ def split_groups_for_each_kanji(k, wikitext):
     sub_group = [] # List to keep track of subsections in the wikitext
     header = None  # To hold the current header name
 
+    # the lines of the current header are kept or not
+    keep = True
+    if keywords:
+        # index of the line of the last keyword, -1 if there is none
+        last_keyword = max(wikitext.rfind(keyword) for keyword in keywords)
+        last_keyword_line = wikitext.count('\n', 0, last_keyword) if last_keyword >= 0 else -1
+
     # Iterating over each line in the wikitext
-    for line in wikitext.split('\n'):
+    for index, line in enumerate(wikitext.split('\n')):
 
-        # Skipping empty lines
-        if line.strip() == "":
+        # Skip the lines of the headers not needed, only a header line may change it
+        if not keep and not line.lstrip().startswith('=') and '<!--' not in line:
             continue
-        
+
         # Remove leading and trailing whitespace, as well as HTML comments from the line
         line = line.strip()
-        line = re.sub(r'\s*<!--[^->]*-->\s*', '', line)
+
+        # Skipping empty lines
+        if line == "":
+            continue
+
+        if '<!--' in line:
+            line = _html_comment.sub('', line)
         
         # If the line is a header (i.e., enclosed in equal signs), it's header of wikitext
         if line.startswith('=') and line.endswith('='):
 
+            # no header containing a keyword follows, the rest of the page is not needed
+            if keywords and index > last_keyword_line:
+                break
+
             # Check if there's an ongoing header; if so, store accumulated lines in result
             if header:
                 if header not in result:
@@ -99,13 +124,22 @@ def split_groups_for_each_kanji(k, wikitext):
             header = line.strip('=').strip() # Reset header to the new header and strip the surrounding equal signs
             level = line.count('=') // 2     # Determine the header level based on the number of equal signs
             sub_group = [level]
+            keep = not keywords or any(keyword in header for keyword in keywords)
     
-        else:
+        elif keep:
             # Add non-header lines to the sub_group
             sub_group.append(line.strip())
 
-    # After the loop, save the last processed header and its contents to the result
-    result[header] = sub_group
+    else:
+        # After the loop, save the last processed header and its contents to the result
+        result[header] = sub_group
+        return result
+
+    # stopped early, the current header is not the last one of the page
+    if header:
+        if header not in result:
+            result[header] = []
+        result[header] += sub_group
 
     return result
 
@@ -0,0 +1,96 @@
+import random
+from collections import Counter
+import pytest
+from preparation.parser import find_common_stem, find_kanji_reading
+
+
+def old_find_common_stem(target, readings):
+    """
+    find_common_stem() before it counted the common prefix of each reading once.
+    """
+    for length in range(len(target), 0, -1):
+        stem = target[:length]
+        if sum(1 for r in readings if r.startswith(stem)) > 1:
+            return stem
+    return target
+
+
+def old_find_kanji_reading(kanji, key, examples):
+    """
+    find_kanji_reading() before the okurigana was matched with str.startswith() at an offset.
+    """
+    readings = []
+    for example in examples:
+        if kanji not in example:
+            continue
+        kanji_index = example.index(kanji)
+        if kanji_index == len(example) - 1:
+            readings.append(key)
+            continue
+        sub_container = example[kanji_index+1:]
+        max_common = ""
+        for i in range(min(len(sub_container), len(key)), 0, -1):
+            if sub_container.startswith(key[-i:]):
+                max_common = key[-i:]
+                break
+        new_key = key[:-len(max_common)]
+        if new_key != '':
+            readings.append(new_key)
+    return Counter(readings).most_common(1)[0][0] if readings else key
+
+
+@pytest.mark.parametrize('target, readings', [
+    # empty stem and empty readings
+    ('', []),
+    ('', ['', 'あ']),
+    ('いきる', []),
+    ('いきる', ['いきる']),
+    # no common prefix at all
+    ('いきる', ['いきる', 'うまれる', 'なま']),
+    # several candidate stems of different lengths
+    ('いきる', ['いきる', 'いかす', 'いける', 'うむ']),
+    ('うまれる', ['うまれる', 'うむ', 'うまれ', 'うまる']),
+    ('あかい', ['あか', 'あかい', 'あからむ', 'あからめる']),
+])
+def test_find_common_stem_cases(target, readings):
+    assert find_common_stem(target, readings) == old_find_common_stem(target, readings)
+
+
+@pytest.mark.parametrize('kanji, key, examples', [
+    # readings without okurigana
+    ('山', 'やま', ['山', '山道', '富士山']),
+    ('林', 'はやし', ['林']),
+    # okurigana at the end of the key
+    ('生', 'いきる', ['生きる', '生き物', '生']),
+    ('赤', 'あからむ', ['赤らむ', '赤らめる']),
+    # the whole key is okurigana, no reading is left
+    ('生', 'きる', ['生きる']),
+    # several candidate readings, the most common one wins
+    ('行', 'おこなう', ['行う', '行い', '行なう', '行なわれる']),
+    ('上', 'あがる', ['上がる', '上がり', '上る', '川上']),
+    # no example contains the kanji
+    ('下', 'した', ['上', '']),
+    ('下', '', ['下', '下がる']),
+    ('下', 'した', []),
+])
+def test_find_kanji_reading_cases(kanji, key, examples):
+    assert find_kanji_reading(kanji, key, examples) == old_find_kanji_reading(kanji, key, examples)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_same_as_before_random(seed):
+    rng = random.Random(seed)
+    kana = 'あいうかきくる'
+
+    def word(max_size, letters=kana):
+        return ''.join(rng.choice(letters) for _ in range(rng.randint(0, max_size)))
+
+    for _ in range(500):
+        readings = [word(5) for _ in range(rng.randint(0, 6))]
+        target = rng.choice(readings) if readings and rng.random() < 0.5 else word(5)
+        assert find_common_stem(target, readings) == old_find_common_stem(target, readings), (target, readings)
+
+        kanji = rng.choice('生上')
+        key = word(5)
+        examples = [word(6, kana + '生上') for _ in range(rng.randint(0, 5))]
+        assert find_kanji_reading(kanji, key, examples) == old_find_kanji_reading(kanji, key, examples), (kanji, key, examples)
@@ -0,0 +1,73 @@
+import random
+import pytest
+from wikt_parser.utils import parsing_pron_arch_build_tree
+
+
+def old_build_tree(levels, texts):
+    """
+    The recursive parsing_pron_arch_build_tree() before it was built with a stack.
+    """
+    if not levels:
+        return []
+    result = []
+    new_levels = levels
+    while min(new_levels):
+        new_levels = [x-1 for x in new_levels]
+
+    sub_levels = []
+    sub_texts = []
+    previous_text = None
+    for index, level in enumerate(new_levels):
+        text = texts[index]
+        if level:
+            sub_levels.append(level)
+            sub_texts.append(text)
+            continue
+        if previous_text:
+            result.append([previous_text] + old_build_tree(sub_levels, sub_texts))
+            sub_texts = []
+            sub_levels = []
+        previous_text = text
+    result.append([previous_text] + old_build_tree(sub_levels, sub_texts))
+    return result
+
+
+def random_walk(rng, size):
+    # level jumps in both directions, e.g. 1 -> 4 -> 2
+    levels = [rng.randint(1, 6)]
+    for _ in range(size - 1):
+        levels.append(max(1, levels[-1] + rng.randint(-3, 3)))
+    return levels
+
+
+def repeated(rng, size):
+    # runs of the same level
+    levels = []
+    while len(levels) < size:
+        levels.extend([rng.randint(1, 4)] * rng.randint(1, 5))
+    return levels[:size]
+
+
+def deep(rng, size):
+    # nested one level deeper each time, then back to a random level
+    levels = []
+    while len(levels) < size:
+        start = rng.randint(1, 3)
+        levels.extend(range(start, start + rng.randint(1, 40)))
+    return levels[:size]
+
+
+def uniform(rng, size):
+    return [rng.randint(1, 5) for _ in range(size)]
+
+
+@pytest.mark.parametrize('generate', [random_walk, repeated, deep, uniform])
+@pytest.mark.parametrize('seed', range(20))
+def test_build_tree_same_as_recursive(generate, seed):
+    rng = random.Random(seed)
+    for _ in range(50):
+        size = rng.randint(0, 60)
+        levels = generate(rng, size) if size else []
+        # an empty text doesn't close the previous block in the recursive builder
+        texts = [rng.choice(['', 'a', 'b', ' c', f't{index}']) for index in range(size)]
+        assert parsing_pron_arch_build_tree(levels, texts) == old_build_tree(levels, texts), (levels, texts)
@@ -0,0 +1,64 @@
+import re
+import pytest
+from wikt_parser.ja_onyomi_parser import text_replacement
+
+
+def old_text_replacement(text):
+    """
+    text_replacement() before the patterns were compiled once and skipped by their literal substring.
+    """
+    text = re.sub(r'[\[\]]', '', text[0])
+    text = text.replace('（', '(').replace('）', ')').replace('：', ':')
+    text = re.sub(r'、|・|　+|,|\'|\u3000', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+
+    text = re.sub(r'<ref.*?</ref>', '', text)
+    text = re.sub(r'<ref.*?/>', '', text)
+    text = re.sub(r'Wiktionary:漢字索引\s*音訓\s*[^\|]*\|', '', text)
+    text = re.sub(r':wikipedia:ja:[^\|]*\|', '', text)
+    text = re.sub(r'{{要出典}}', '', text)
+
+    text = re.sub(r'\(例:[^\)]+\)', '', text)
+    text = re.sub(r'\s+例．.*$', '', text)
+    text = re.sub(r'\(\s*表外:.*\)', '(表外)', text)
+    text = re.sub(r'\(表外[^\)]*\)', '(表外)', text)
+    text = re.sub(r'{{音\|([^}]*)}}', r'\1', text)
+    text = re.sub(r'[\u3041-\u3096]*\|([^\s*])', r'\1', text)
+
+    text = re.sub(r'([^\s\(\)]*)\((\s*[^\s\(\)]*)\s+([^\s\(\)]*)\)', r"\1(\2)(\3)", text)
+    text = re.sub(r'([^\s\(\)]*)\(\s*([^\s\(\)]*)\s+([^\s\(\)]*)\s+([^\s\(\)]*)\)', r"\1(\2)(\3)(\4)", text)
+
+    text = re.sub(r'\(([^:]+):[^\)]+\)', r'(\1)', text)
+
+    if text.strip() == '無し':
+        text = ""
+
+    return text
+
+
+SNIPPETS = [
+    # {{要出典}}
+    ' [[呉音]] : [[ゴウ]]{{要出典}}',
+    '{{要出典}}[[漢音]]：[[カン]]、[[ケン]]{{要出典}}',
+    # full-width spaces and signs
+    ' [[呉音]]　:　[[ゴウ]]　　[[ガフ]]',
+    '[[漢音]]　：　[[コウ]]・[[カフ]],[[カウ]]',
+    '[[慣用音]] （ [[テキ]]　[[チャク]] ）',
+    # the patterns skipped by the literal substring, and the ones which are not
+    '[[呉音]]: [[ゴ]]<ref>出典</ref>、[[グ]]<ref name="a"/>',
+    '[[Wiktionary:漢字索引 音訓 こ|コウ]]、[[:wikipedia:ja:呉音|呉音]]',
+    '[[漢音]]: [[セイ]](例: 清潔)  例．清書',
+    '[[唐音]]: [[シン]](表外: 唐音)、[[チン]](表外 慣用)',
+    '[[呉音]]: {{音|ジョウ}}、[[じょう|ジョウ]]',
+    '[[漢音]]: [[ショウ]]( 表外 慣用 訓)、[[セイ]](呉音:セイ)',
+    # nothing to replace
+    '呉音: ゴウ',
+    '無し',
+    '  無し  ',
+    '',
+]
+
+
+@pytest.mark.parametrize('text', SNIPPETS)
+def test_text_replacement_same_as_before(text):
+    assert text_replacement([text]) == old_text_replacement([text])
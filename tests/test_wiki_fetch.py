@@ -0,0 +1,100 @@
+import json
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+from wikt_cache.wiki_cache import WikiCache
+from wikt_cache.wikitext_sections import split_sections, section_text
+
+KANJI_LIST = [chr(0x4e00 + i) for i in range(12)]
+
+
+def page_text(kanji, lang):
+    if lang == 'ja':
+        return f'==日本語==\n===発音===\n* 音読み: [[{kanji}]]\n==中国語==\n* {kanji}\n'
+    return f'==漢語==\n===發音===\n* 拼音 {ord(kanji) % 7}\n===釋義===\n# {kanji}\n'
+
+
+class WiktionaryHandler(BaseHTTPRequestHandler):
+    """
+    A stand-in of the `action=parse` and `action=query` APIs, serving the pages of page_text().
+
+    The first `failures[title]` requests of a page are answered with 503 and a short Retry-After.
+    """
+    failures = {}
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+
+    def _send(self, status, body=None, headers=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        lang = url.path.split('/')[1]
+        query = dict(urllib.parse.parse_qsl(url.query))
+        title = query.get('page') or query.get('titles')
+        with self.lock:
+            if self.failures.get(title):
+                self.failures[title] -= 1
+                return self._send(503, headers={'Retry-After': '0.1'})
+
+        if query['action'] == 'parse':
+            text = page_text(title, lang)
+            sections = split_sections(text)
+            parsed = {'title': title, 'revid': ord(title)}
+            if query['prop'] == 'sections':
+                parsed['sections'] = [{'index': str(index), 'anchor': heading} for index, level, heading, start, end in sections]
+            else:
+                for prop in query['prop'].split('|'):
+                    parsed[prop] = {'*': section_text(text, sections, int(query['section']))}
+            return self._send(200, {'parse': parsed})
+
+        pages = [{'title': kanji, 'revisions': [{'revid': ord(kanji), 'slots': {'main': {'content': page_text(kanji, lang)}}}]}
+                 for kanji in query['titles'].split('|')]
+        return self._send(200, {'query': {'pages': pages}})
+
+
+@pytest.fixture
+def api_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), WiktionaryHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:%d/%%s/w/api.php' % server.server_address[1]
+    server.shutdown()
+    server.server_close()
+    WiktionaryHandler.failures.clear()
+
+
+def fetch_all(cache_dir, api_url, **options):
+    cache_dir.mkdir()
+    WikiCache(str(cache_dir), api_url).fetch(KANJI_LIST, **options)
+    wc = WikiCache(str(cache_dir))
+    return {kanji: wc.wiki_dict[kanji] for kanji in wc.wiki_dict}, wc.revisions
+
+
+def test_concurrent_fetch_same_as_serial(tmp_path, api_url):
+    serial = fetch_all(tmp_path / 'serial', api_url)
+    assert sorted(serial[0]) == KANJI_LIST
+    assert serial[0][KANJI_LIST[0]][0].startswith('==日本語==')
+    assert serial[0][KANJI_LIST[0]][2].startswith('===發音===')
+
+    assert fetch_all(tmp_path / 'workers', api_url, workers=4) == serial
+    assert fetch_all(tmp_path / 'batch', api_url, workers=4, batch_size=5) == serial
+    assert fetch_all(tmp_path / 'checkpoint', api_url, workers=4, checkpoint=True) == serial
+
+
+def test_fetch_retried_after_503(tmp_path, api_url):
+    serial = fetch_all(tmp_path / 'serial', api_url)
+    WiktionaryHandler.failures.update({KANJI_LIST[0]: 2, KANJI_LIST[5]: 1})
+    assert fetch_all(tmp_path / 'retried', api_url, workers=4) == serial
+    assert not any(WiktionaryHandler.failures.values())